@@ -13,14 +13,21 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    from app import database, json_provider, compression, metrics
+    database.configure_engine_options(app)
+    json_provider.init_app(app)
+    
     # Initialize extensions
     db.init_app(app)
+    database.init_app(app)
+    metrics.init_app(app)
     migrate.init_app(app, db)
     CORS(app)
     jwt.init_app(app)
+    compression.init_app(app)
     
     # Register blueprints
-    from app.routes import auth, services, customers, inventory, orders, reports, expenses
+    from app.routes import auth, services, customers, inventory, orders, reports, expenses, exports
     
     app.register_blueprint(auth.bp)
     app.register_blueprint(services.bp)
@@ -29,9 +36,24 @@ def create_app(config_class=Config):
     app.register_blueprint(orders.bp)
     app.register_blueprint(reports.bp)
     app.register_blueprint(expenses.bp)
+    app.register_blueprint(exports.bp)
+    
+    # JWT revocation check (registers the blocklist loader on jwt)
+    from app import security
+    
+    # CLI commands
+    from app import rollups, ledger, analytics
+    
+    app.cli.add_command(rollups.rebuild_rollups_command)
+    app.cli.add_command(ledger.rebuild_ledger_command)
+    app.cli.add_command(analytics.compute_rfm_command)
     
     @app.route('/api/health')
     def health_check():
         return {'status': 'healthy', 'message': 'Kocho Printers API is running'}, 200
     
+    @app.route('/api/health/pool')
+    def pool_health():
+        return database.pool_stats(), 200
+    
     return app
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+In-process cache for catalog and category reference data
+
+Responses for the service catalog and the category lists are serialized
+once and kept as bytes with a strong ETag (SHA-256 of the body), so a
+request with a matching If-None-Match costs neither a query nor a body.
+
+Every entry is tagged with the cache version; service writes call bump() to
+invalidate this worker immediately. Other workers pick the change up within
+CATALOG_CACHE_TTL seconds. Because the ETag is derived from the body, all
+workers agree on it for the same data.
+
+Keys can come from the query string (?category=), so the cache holds at most
+CATALOG_CACHE_MAX_ENTRIES entries and evicts the least recently used.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, request
+
+
+class CatalogCache:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entries = OrderedDict()
+
+    @property
+    def version(self):
+        return self._version
+
+    def bump(self):
+        """Invalidate every cached entry after a catalog write"""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def get(self, key, loader):
+        """Return (body, etag) for key, calling loader() for the data on a miss"""
+        ttl = current_app.config.get('CATALOG_CACHE_TTL', 60)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == self._version and now - entry[1] < ttl:
+                self._entries.move_to_end(key)
+                return entry[2], entry[3]
+
+        version = self._version
+        body = current_app.json.dumps(loader()) + '\n'
+        etag = hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = (version, now, body, etag)
+                self._entries.move_to_end(key)
+                while len(self._entries) > current_app.config.get('CATALOG_CACHE_MAX_ENTRIES', 256):
+                    self._entries.popitem(last=False)
+
+        return body, etag
+
+
+catalog_cache = CatalogCache()
+
+
+def cached_json_response(key, loader):
+    """200 with a strong ETag, or 304 when the client already has this version"""
+    body, etag = catalog_cache.get(key, loader)
+
+    # Weak comparison: the ETag is weakened when the response is compressed
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype='application/json')
+
+    response.set_etag(etag)
+    # Always revalidate; the data is behind auth so keep it out of shared caches
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
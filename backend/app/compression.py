@@ -0,0 +1,61 @@
+"""
+Negotiated response compression
+
+JSON, CSV and text responses of at least COMPRESS_MIN_SIZE bytes are
+compressed with brotli or gzip, whichever the client's Accept-Encoding
+ranks higher (brotli on ties). Smaller bodies are sent as is, since the
+header and CPU overhead outweigh the saving. Streamed and file responses
+(exports, PDFs, zips) pass through untouched.
+
+A compressed response gets a weak ETag, as a strong one must identify the
+exact bytes; If-None-Match uses weak comparison so 304s still work.
+brotli is optional: without the package only gzip is offered.
+"""
+
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/csv', 'text/plain', 'text/html'}
+
+
+def _compress(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['BROTLI_QUALITY'])
+    return gzip.compress(data, compresslevel=config['GZIP_LEVEL'], mtime=0)
+
+
+def init_app(app):
+    config = {
+        'COMPRESS_MIN_SIZE': app.config.get('COMPRESS_MIN_SIZE', 1024),
+        'GZIP_LEVEL': app.config.get('GZIP_LEVEL', 6),
+        'BROTLI_QUALITY': app.config.get('BROTLI_QUALITY', 5)
+    }
+    encodings = ['br', 'gzip'] if brotli else ['gzip']
+
+    @app.after_request
+    def compress_response(response):
+        if (response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        if (response.content_length or 0) < config['COMPRESS_MIN_SIZE']:
+            return response
+
+        encoding = request.accept_encodings.best_match(encodings)
+        if encoding is None:
+            return response
+
+        response.set_data(_compress(response.get_data(), encoding, config))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,106 @@
+"""
+Database engine tuning
+
+- Engine/pool options come from the DB_PROFILE in config.py.
+- On PostgreSQL every transaction opened during a request starts with
+  SET LOCAL statement_timeout, using the timeout configured for the request's
+  blueprint (STATEMENT_TIMEOUTS_MS): short on the POS write paths, longer on
+  reports, so one slow report cannot hold a connection for minutes.
+- Pools are TimedQueuePool, which records how long each checkout waited
+  for a free connection; see pool_stats() and /api/health/pool.
+"""
+
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from app import db
+
+
+class PoolWaitStats:
+    """Checkout wait counters, shared by every pool in the process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.timeouts = 0
+
+    def record(self, seconds, timed_out=False):
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'checkouts': self.count,
+                'wait_seconds_total': self.total_seconds,
+                'wait_seconds_max': self.max_seconds,
+                'wait_seconds_avg': self.total_seconds / self.count if self.count else 0.0,
+                'timeouts': self.timeouts
+            }
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            pool_wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_wait_stats.record(time.perf_counter() - start)
+        return connection
+
+
+def configure_engine_options(app):
+    """Use TimedQueuePool wherever the profile configures a sized pool"""
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if 'pool_size' in options:
+        options.setdefault('poolclass', TimedQueuePool)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def _set_statement_timeout(conn):
+    if not has_request_context():
+        return
+    timeout_ms = g.get('statement_timeout_ms')
+    if timeout_ms:
+        conn.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout_ms)}')
+
+
+def init_app(app):
+    timeouts = app.config.get('STATEMENT_TIMEOUTS_MS', {})
+
+    @app.before_request
+    def choose_statement_timeout():
+        g.statement_timeout_ms = timeouts.get(request.blueprint, timeouts.get('default'))
+
+    with app.app_context():
+        if db.engine.dialect.name == 'postgresql':
+            event.listen(db.engine, 'begin', _set_statement_timeout)
+
+
+def pool_stats():
+    """Current pool occupancy plus checkout wait counters"""
+    pool = db.engine.pool
+    stats = {'pool': pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow()
+        })
+    stats.update(pool_wait_stats.snapshot())
+    return stats
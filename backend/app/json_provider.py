@@ -0,0 +1,63 @@
+"""
+orjson-backed JSON provider
+
+Replaces Flask's json-module provider for jsonify(), request.get_json() and
+current_app.json. orjson encodes datetimes, dates, UUIDs and dataclasses
+natively (datetimes as ISO 8601, the same format the models' to_dict()
+produce) and writes bytes directly, so large list and report responses skip
+the str round trip.
+
+Selected with JSON_PROVIDER ('orjson' or 'default') in config.py.
+"""
+
+import decimal
+import orjson
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+
+class OrjsonProvider(JSONProvider):
+    sort_keys = False
+    compact = None
+    mimetype = 'application/json'
+
+    @staticmethod
+    def default(o):
+        """Encode the types orjson does not handle itself, like Flask's provider does"""
+        if isinstance(o, decimal.Decimal):
+            return str(o)
+        if hasattr(o, '__html__'):
+            return str(o.__html__())
+        raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+    def _option(self, sort_keys=None, indent=None):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys if sort_keys is None else sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        option = self._option(kwargs.get('sort_keys'), kwargs.get('indent'))
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        body = orjson.dumps(obj, default=self.default, option=self._option(indent=pretty))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+PROVIDERS = {
+    'orjson': OrjsonProvider,
+    'default': DefaultJSONProvider
+}
+
+
+def init_app(app):
+    provider_class = PROVIDERS[app.config.get('JSON_PROVIDER', 'orjson')]
+    app.json_provider_class = provider_class
+    app.json = provider_class(app)
@@ -0,0 +1,199 @@
+"""
+Monthly revenue/expense ledger
+
+The monthly_ledger table holds one row per calendar month with paid revenue
+(final_amount of orders with payment_status 'paid', by created_at, the same
+definition as the daily sales rollup), expenses and the number of customers
+created. Order changes reach it through rollups.apply_order/unapply_order;
+the expense and customer routes call apply_expense/unapply_expense and
+apply_customer/unapply_customer. All run inside the writer's transaction.
+
+Profit and loss reads whole months from here and only the partial months at
+either end of the range from the live tables (see month_segments). The
+customer total is the sum of new_customers, so it never counts the
+customers table.
+
+Rebuild from history with:
+flask rebuild-ledger
+"""
+
+from datetime import date, datetime, time, timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db
+from app.models import Order, Expense, Customer, MonthlyLedger
+
+COUNTERS = ['revenue', 'paid_orders', 'expenses', 'expense_count', 'new_customers']
+
+
+def month_of(value):
+    return date(value.year, value.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def period_start(column, unit):
+    """SQL date of the first day of the day/week/month containing column (weeks start Monday)"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return func.date(func.date_trunc(unit, column))
+    if unit == 'week':
+        return func.date(column, 'weekday 0', '-6 days')
+    if unit == 'month':
+        return func.strftime('%Y-%m-01', column)
+    return func.date(column)
+
+
+def _bump(month, **deltas):
+    """Atomically add deltas to the ledger row for month"""
+    values = {counter: deltas.get(counter, 0) for counter in COUNTERS}
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+        stmt = insert(MonthlyLedger).values(month=month, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['month'],
+            set_={
+                counter: getattr(MonthlyLedger, counter) + getattr(stmt.excluded, counter)
+                for counter in COUNTERS
+            }
+        )
+        db.session.execute(stmt)
+        return
+
+    updated = MonthlyLedger.query.filter_by(month=month).update({
+        getattr(MonthlyLedger, counter): getattr(MonthlyLedger, counter) + value
+        for counter, value in values.items()
+    }, synchronize_session=False)
+    if not updated:
+        db.session.add(MonthlyLedger(month=month, **values))
+
+
+def apply_orders(orders, sign=1):
+    """Add (sign=-1: remove) the paid orders among orders, one upsert per month"""
+    months = {}
+    for order in orders:
+        if order.payment_status != 'paid':
+            continue
+        month = month_of(order.created_at)
+        count, revenue = months.get(month, (0, 0))
+        months[month] = (count + 1, revenue + (order.final_amount or 0))
+
+    for month, (count, revenue) in months.items():
+        _bump(month, paid_orders=sign * count, revenue=sign * revenue)
+
+
+def apply_expense(expense):
+    """Add a flushed expense (created_at set) to its month"""
+    _bump(month_of(expense.created_at), expenses=expense.amount or 0, expense_count=1)
+
+
+def unapply_expense(expense):
+    """Remove an expense from its month before it is changed or deleted"""
+    _bump(month_of(expense.created_at), expenses=-(expense.amount or 0), expense_count=-1)
+
+
+def apply_customer(customer):
+    """Count a flushed customer (created_at set) in its month"""
+    if customer.created_at:
+        _bump(month_of(customer.created_at), new_customers=1)
+
+
+def unapply_customer(customer):
+    """Remove a customer from its month before it is deleted"""
+    if customer.created_at:
+        _bump(month_of(customer.created_at), new_customers=-1)
+
+
+def total_customers():
+    """Number of customers, from the ledger rather than a count of the customers table"""
+    return db.session.query(func.coalesce(func.sum(MonthlyLedger.new_customers), 0)).scalar()
+
+
+def month_segments(start_date, end_date):
+    """
+    Split the inclusive range [start_date, end_date] by calendar month into
+    (month, segment_start, segment_end, whole_month) tuples.
+    """
+    segments = []
+    month = month_of(start_date)
+    while datetime.combine(month, time.min) <= end_date:
+        month_start = datetime.combine(month, time.min)
+        month_end = datetime.combine(next_month(month), time.min) - timedelta(microseconds=1)
+        segment_start = max(start_date, month_start)
+        segment_end = min(end_date, month_end)
+        segments.append((
+            month, segment_start, segment_end,
+            segment_start == month_start and segment_end == month_end
+        ))
+        month = next_month(month)
+    return segments
+
+
+def monthly_totals(first_month, last_month):
+    """{month: (revenue, expenses)} from the ledger for first_month..last_month"""
+    return {
+        month: (revenue, expenses)
+        for month, revenue, expenses in db.session.query(
+            MonthlyLedger.month, MonthlyLedger.revenue, MonthlyLedger.expenses
+        ).filter(
+            MonthlyLedger.month >= first_month,
+            MonthlyLedger.month <= last_month
+        )
+    }
+
+
+def rebuild():
+    """Replace the ledger contents with monthly totals computed from orders and expenses"""
+    MonthlyLedger.query.delete(synchronize_session=False)
+
+    months = {}
+
+    order_month = period_start(Order.created_at, 'month')
+    for month, count, revenue in db.session.query(
+        order_month, func.count(Order.id), func.coalesce(func.sum(Order.final_amount), 0)
+    ).filter(
+        Order.created_at.isnot(None),
+        Order.payment_status == 'paid'
+    ).group_by(order_month):
+        months.setdefault(month, {}).update(paid_orders=count, revenue=revenue)
+
+    expense_month = period_start(Expense.created_at, 'month')
+    for month, count, total in db.session.query(
+        expense_month, func.count(Expense.id), func.coalesce(func.sum(Expense.amount), 0)
+    ).filter(
+        Expense.created_at.isnot(None)
+    ).group_by(expense_month):
+        months.setdefault(month, {}).update(expense_count=count, expenses=total)
+
+    customer_month = period_start(Customer.created_at, 'month')
+    for month, count in db.session.query(
+        customer_month, func.count(Customer.id)
+    ).filter(
+        Customer.created_at.isnot(None)
+    ).group_by(customer_month):
+        months.setdefault(month, {}).update(new_customers=count)
+
+    db.session.add_all([
+        MonthlyLedger(
+            month=month if isinstance(month, date) else date.fromisoformat(month),
+            **{counter: values.get(counter, 0) for counter in COUNTERS}
+        )
+        for month, values in months.items()
+    ])
+    db.session.commit()
+
+    return len(months)
+
+
+@click.command('rebuild-ledger')
+@with_appcontext
+def rebuild_ledger_command():
+    """Rebuild monthly_ledger from the orders, expenses and customers tables."""
+    rows = rebuild()
+    click.echo(f'✓ monthly_ledger rebuilt ({rows} rows)')
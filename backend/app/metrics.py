@@ -0,0 +1,347 @@
+"""
+Prometheus metrics
+
+/api/metrics serves, in the Prometheus text format:
+
+- kocho_http_requests_total{blueprint,endpoint,method,status}
+- kocho_http_request_duration_seconds{blueprint,endpoint,method} (histogram)
+- kocho_http_response_size_bytes{blueprint,endpoint} (histogram, bytes on
+  the wire after compression; streamed responses are not sized)
+- kocho_sql_statements_total / kocho_sql_duration_seconds_total
+  {blueprint,endpoint}, from engine cursor events
+- kocho_db_pool_checkouts_total, kocho_db_pool_checkout_wait_seconds_total
+  and kocho_db_pool_checkout_timeouts_total (see database.pool_wait_stats)
+- kocho_report_cache_{hits,misses,invalidations}_total{report}
+
+Labels use the Flask endpoint name, never the raw path, so cardinality is
+bounded by the route table. Each request accumulates its SQL counters in g
+and takes the registry lock once, in after_request.
+
+Under gunicorn every worker has its own registry. With METRICS_DIR set,
+a thread in each worker writes its snapshot there every
+METRICS_FLUSH_INTERVAL seconds while it changes (and on exit), and
+/api/metrics sums all files, so a scrape sees the whole server whichever
+worker answers it. Files of exited workers are
+folded into archive.json by the master (see gunicorn.conf.py). Without
+METRICS_DIR the endpoint reports the answering process only.
+"""
+
+import fcntl
+import hmac
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from app import db
+from app.database import pool_wait_stats
+from app.report_cache import report_cache_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAM_BUCKETS = {
+    'kocho_http_request_duration_seconds': LATENCY_BUCKETS,
+    'kocho_http_response_size_bytes': SIZE_BUCKETS
+}
+
+HELP = {
+    'kocho_http_requests_total': 'HTTP requests by endpoint and status.',
+    'kocho_http_request_duration_seconds': 'Time spent handling a request.',
+    'kocho_http_response_size_bytes': 'Response body size as sent.',
+    'kocho_sql_statements_total': 'SQL statements executed while handling requests.',
+    'kocho_sql_duration_seconds_total': 'Time spent executing SQL while handling requests.',
+    'kocho_db_pool_checkouts_total': 'Connection pool checkouts.',
+    'kocho_db_pool_checkout_wait_seconds_total': 'Time spent waiting for a pooled connection.',
+    'kocho_db_pool_checkout_timeouts_total': 'Pool checkouts that timed out.',
+    'kocho_report_cache_hits_total': 'Report cache hits.',
+    'kocho_report_cache_misses_total': 'Report cache misses.',
+    'kocho_report_cache_invalidations_total': 'Report cache entries invalidated.'
+}
+
+ARCHIVE_FILE = 'archive.json'
+
+
+class MetricsRegistry:
+    """Counters and histograms for this process, keyed by (name, labels)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self.changes = 0
+
+    def _observe(self, name, labels, value):
+        buckets = HISTOGRAM_BUCKETS[name]
+        histogram = self._histograms.get((name, labels))
+        if histogram is None:
+            # Per-bucket (non-cumulative) counts, then +Inf, then the sum
+            histogram = self._histograms[(name, labels)] = [0] * (len(buckets) + 2)
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(buckets)
+        histogram[index] += 1
+        histogram[-1] += value
+
+    def _inc(self, name, labels, value=1):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def record_request(self, blueprint, endpoint, method, status, seconds, size, sql_statements, sql_seconds):
+        route = (('blueprint', blueprint), ('endpoint', endpoint))
+        with self._lock:
+            self.changes += 1
+            self._inc('kocho_http_requests_total', route + (('method', method), ('status', status)))
+            self._observe('kocho_http_request_duration_seconds', route + (('method', method),), seconds)
+            if size is not None:
+                self._observe('kocho_http_response_size_bytes', route, size)
+            if sql_statements:
+                self._inc('kocho_sql_statements_total', route, sql_statements)
+                self._inc('kocho_sql_duration_seconds_total', route, sql_seconds)
+
+    def snapshot(self):
+        """JSON-serializable samples: [[kind, name, [[label, value], ...], value], ...]"""
+        with self._lock:
+            samples = [['counter', name, list(labels), value] for (name, labels), value in self._counters.items()]
+            samples += [['histogram', name, list(labels), list(values)] for (name, labels), values in self._histograms.items()]
+
+        pool = pool_wait_stats.snapshot()
+        samples += [
+            ['counter', 'kocho_db_pool_checkouts_total', [], pool['checkouts']],
+            ['counter', 'kocho_db_pool_checkout_wait_seconds_total', [], pool['wait_seconds_total']],
+            ['counter', 'kocho_db_pool_checkout_timeouts_total', [], pool['timeouts']]
+        ]
+
+        for report, counters in report_cache_stats.snapshot().items():
+            for outcome, value in counters.items():
+                samples.append(['counter', f'kocho_report_cache_{outcome}_total', [['report', report]], value])
+        return samples
+
+
+registry = MetricsRegistry()
+
+
+def merge(snapshots):
+    """Sum snapshots from several processes into {(kind, name, labels): value}"""
+    merged = {}
+    for samples in snapshots:
+        for kind, name, labels, value in samples:
+            key = (kind, name, tuple(tuple(pair) for pair in labels))
+            if key not in merged:
+                merged[key] = list(value) if kind == 'histogram' else value
+            elif kind == 'histogram':
+                merged[key] = [a + b for a, b in zip(merged[key], value)]
+            else:
+                merged[key] += value
+    return merged
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def render(merged):
+    """Prometheus text exposition format (version 0.0.4)"""
+    by_name = {}
+    for (_, name, labels), value in merged.items():
+        by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, samples in sorted(by_name.items()):
+        buckets = HISTOGRAM_BUCKETS.get(name)
+        lines.append(f'# HELP {name} {HELP.get(name, name)}')
+        lines.append(f'# TYPE {name} {"histogram" if buckets else "counter"}')
+        for labels, value in sorted(samples):
+            if not buckets:
+                lines.append(f'{name}{_labels(labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), value[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {value[-1]}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def _locked(directory, shared):
+    with open(os.path.join(directory, '.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_json(path, data):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def flush(directory):
+    """Write this process's snapshot to directory/<pid>.json"""
+    os.makedirs(directory, exist_ok=True)
+    _write_json(os.path.join(directory, f'{os.getpid()}.json'), registry.snapshot())
+
+
+def read_all(directory):
+    """Merged samples of every worker file plus the archive"""
+    snapshots = []
+    with _locked(directory, shared=True):
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return merge(snapshots)
+
+
+def _archive(directory, pid):
+    path = os.path.join(directory, f'{pid}.json')
+    if not os.path.exists(path):
+        return
+    archive_path = os.path.join(directory, ARCHIVE_FILE)
+    with _locked(directory, shared=False):
+        snapshots = []
+        for source in (archive_path, path):
+            if os.path.exists(source):
+                with open(source) as f:
+                    snapshots.append(json.load(f))
+        merged = merge(snapshots)
+        _write_json(archive_path, [[kind, name, [list(pair) for pair in labels], value]
+                                   for (kind, name, labels), value in merged.items()])
+        os.remove(path)
+
+
+_pending_archive = []
+_archiving = False
+
+
+def archive_worker(directory, pid):
+    """Fold an exited worker's file into the archive (call from the gunicorn master)"""
+    global _archiving
+    _pending_archive.append(pid)
+    # gunicorn calls child_exit from its SIGCHLD handler, which can interrupt
+    # an archive in progress; the outer call picks the new pid up instead of
+    # blocking on the lock it already holds. Files left behind are still read.
+    if _archiving:
+        return
+    _archiving = True
+    try:
+        while _pending_archive:
+            _archive(directory, _pending_archive.pop(0))
+    finally:
+        _archiving = False
+
+
+class Flusher:
+    """Daemon thread writing this worker's snapshot every interval while it changes"""
+
+    def __init__(self, directory, interval):
+        self.directory = directory
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_running(self):
+        # Started lazily in each worker: threads do not survive fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='metrics-flush', daemon=True).start()
+
+    def _run(self):
+        flushed = None
+        while True:
+            time.sleep(self.interval)
+            changes = registry.changes
+            if changes != flushed:
+                flush(self.directory)
+                flushed = changes
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['metrics_query_start'].pop()
+    if has_request_context():
+        g.metrics_sql_statements = g.get('metrics_sql_statements', 0) + 1
+        g.metrics_sql_seconds = g.get('metrics_sql_seconds', 0.0) + time.perf_counter() - started
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get('metrics_query_start'):
+        context.connection.info['metrics_query_start'].pop()
+
+
+def init_app(app):
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    directory = app.config.get('METRICS_DIR')
+    flusher = Flusher(directory, app.config.get('METRICS_FLUSH_INTERVAL', 1.0)) if directory else None
+    token = app.config.get('METRICS_TOKEN')
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('metrics_start')
+        if started is None:
+            return response
+
+        registry.record_request(
+            request.blueprint or '',
+            request.endpoint or 'unmatched',
+            request.method,
+            str(response.status_code),
+            time.perf_counter() - started,
+            None if response.is_streamed else response.content_length,
+            g.get('metrics_sql_statements', 0),
+            g.get('metrics_sql_seconds', 0.0)
+        )
+        if flusher:
+            flusher.ensure_running()
+        return response
+
+    @app.route('/api/metrics')
+    def metrics():
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return {'error': 'Unauthorized'}, 401
+
+        if directory:
+            flush(directory)
+            merged = read_all(directory)
+        else:
+            merged = merge([registry.snapshot()])
+        return Response(render(merged), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(db.engine, 'handle_error', _handle_error)
+
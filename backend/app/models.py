@@ -1,6 +1,7 @@
 from datetime import datetime
+from sqlalchemy.ext.hybrid import hybrid_property
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.passwords import hash_password, verify_password, needs_rehash
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -13,14 +14,18 @@ class User(db.Model):
     role = db.Column(db.String(20), nullable=False)  # owner, employee
     phone = db.Column(db.String(15))
     is_active = db.Column(db.Boolean, default=True)
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # bump to revoke issued JWTs
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
     
     def to_dict(self):
         return {
@@ -74,6 +79,27 @@ class Customer(db.Model):
     
     orders = db.relationship('Order', backref='customer', lazy=True)
     
+    __table_args__ = (
+        # Listing order is last_visit DESC NULLS LAST, id DESC. SQLite rejects
+        # NULLS in index definitions but sorts NULLs lowest, so walking the
+        # ascending index backwards already gives that order there
+        db.Index('ix_customers_last_visit_id',
+                 db.text('last_visit DESC NULLS LAST'), db.text('id DESC')).ddl_if(dialect='postgresql'),
+        db.Index('ix_customers_last_visit_id', 'last_visit', 'id').ddl_if(
+            callable_=lambda ddl, target, bind, dialect=None, **kw: dialect.name != 'postgresql'),
+        db.Index('ix_customers_created_at', 'created_at'),
+        db.Index('ix_customers_total_spent', 'total_spent'),
+        db.Index('ix_customers_with_balance', 'account_balance',
+                 postgresql_where=db.text('account_balance > 0')),
+        # pg_trgm GIN indexes backing app.search
+        db.Index('ix_customers_name_trgm', 'name',
+                 postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_customers_phone_trgm', 'phone',
+                 postgresql_using='gin', postgresql_ops={'phone': 'gin_trgm_ops'}),
+        db.Index('ix_customers_email_trgm', 'email',
+                 postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -103,8 +129,14 @@ class InventoryItem(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    @property
+    __table_args__ = (
+        db.Index('ix_inventory_items_low_stock', 'id',
+                 postgresql_where=db.text('quantity <= min_quantity')),
+    )
+    
+    @hybrid_property
     def is_low_stock(self):
+        # Works on instances and as a SQL filter: InventoryItem.query.filter(InventoryItem.is_low_stock)
         return self.quantity <= self.min_quantity
     
     def to_dict(self):
@@ -140,6 +172,23 @@ class Order(db.Model):
     completed_at = db.Column(db.DateTime)
     
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
+    transactions = db.relationship('Transaction', backref='order', lazy=True)
+    
+    __table_args__ = (
+        db.Index('ix_orders_created_at_id', 'created_at', 'id'),
+        db.Index('ix_orders_paid_created_at', 'created_at',
+                 postgresql_where=db.text("payment_status = 'paid'")),
+        db.Index('ix_orders_status_created_at', 'status', 'created_at'),
+        db.Index('ix_orders_customer_id_created_at', 'customer_id', 'created_at'),
+    )
+    
+    @classmethod
+    def query_with_details(cls):
+        """Order query that eager-loads everything to_dict() touches"""
+        return cls.query.options(
+            db.joinedload(cls.customer),
+            db.selectinload(cls.items)
+        )
     
     def to_dict(self):
         return {
@@ -173,6 +222,11 @@ class OrderItem(db.Model):
     total_price = db.Column(db.Float, nullable=False)
     specifications = db.Column(db.Text)  # JSON string for printing specs, etc.
     
+    __table_args__ = (
+        db.Index('ix_order_items_order_id', 'order_id'),
+        db.Index('ix_order_items_item_type_order_id', 'item_type', 'order_id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -198,6 +252,10 @@ class Transaction(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_transactions_order_id', 'order_id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -223,6 +281,11 @@ class Expense(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_expenses_created_at_id', 'created_at', 'id'),
+        db.Index('ix_expenses_category_created_at', 'category', 'created_at'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -232,4 +295,135 @@ class Expense(db.Model):
             'payment_method': self.payment_method,
             'receipt_number': self.receipt_number,
             'created_at': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
+        }
+
+class DailySalesRollup(db.Model):
+    __tablename__ = 'daily_sales_rollup'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sale_date = db.Column(db.Date, nullable=False)
+    payment_method = db.Column(db.String(20), nullable=False)
+    payment_status = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    total_sales = db.Column(db.Float, nullable=False, default=0.0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('sale_date', 'payment_method', 'payment_status', 'status',
+                            name='uq_daily_sales_rollup_key'),
+    )
+    
+    def to_dict(self):
+        return {
+            'sale_date': self.sale_date.isoformat() if self.sale_date else None,
+            'payment_method': self.payment_method,
+            'payment_status': self.payment_status,
+            'status': self.status,
+            'order_count': self.order_count,
+            'total_sales': self.total_sales
+        }
+
+
+# Order numbers: PostgreSQL hands out blocks of ORDER_NUMBER_BLOCK_SIZE from
+# order_number_seq; databases without sequences use order_number_counter.
+ORDER_NUMBER_BLOCK_SIZE = 100
+
+order_number_seq = db.Sequence(
+    'order_number_seq', start=1, increment=ORDER_NUMBER_BLOCK_SIZE, metadata=db.metadata
+)
+
+
+class OrderNumberCounter(db.Model):
+    __tablename__ = 'order_number_counter'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False, default=1)
+
+
+class MonthlyLedger(db.Model):
+    __tablename__ = 'monthly_ledger'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Date, nullable=False)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    paid_orders = db.Column(db.Integer, nullable=False, default=0)
+    expenses = db.Column(db.Float, nullable=False, default=0.0)
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+    new_customers = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('month', name='uq_monthly_ledger_month'),
+    )
+    
+    def to_dict(self):
+        return {
+            'month': self.month.isoformat() if self.month else None,
+            'revenue': self.revenue,
+            'paid_orders': self.paid_orders,
+            'expenses': self.expenses,
+            'expense_count': self.expense_count,
+            'new_customers': self.new_customers
+        }
+
+
+class CustomerRfm(db.Model):
+    __tablename__ = 'customer_rfm'
+    
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id', ondelete='CASCADE'), primary_key=True)
+    last_order_at = db.Column(db.DateTime)
+    recency_days = db.Column(db.Integer)
+    frequency = db.Column(db.Integer, nullable=False, default=0)
+    monetary = db.Column(db.Float, nullable=False, default=0.0)
+    r_score = db.Column(db.SmallInteger, nullable=False, default=0)
+    f_score = db.Column(db.SmallInteger, nullable=False, default=0)
+    m_score = db.Column(db.SmallInteger, nullable=False, default=0)
+    segment = db.Column(db.String(30), nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+    
+    customer = db.relationship('Customer')
+    
+    __table_args__ = (
+        db.Index('ix_customer_rfm_monetary', 'monetary', 'customer_id'),
+        db.Index('ix_customer_rfm_segment_monetary', 'segment', 'monetary', 'customer_id'),
+    )
+    
+    def to_dict(self):
+        return {
+            'customer': {
+                'id': self.customer.id,
+                'name': self.customer.name,
+                'phone': self.customer.phone,
+                'email': self.customer.email
+            } if self.customer else {'id': self.customer_id},
+            'last_order_at': self.last_order_at.isoformat() if self.last_order_at else None,
+            'recency_days': self.recency_days,
+            'frequency': self.frequency,
+            'monetary': self.monetary,
+            'r_score': self.r_score,
+            'f_score': self.f_score,
+            'm_score': self.m_score,
+            'rfm_score': f'{self.r_score}{self.f_score}{self.m_score}',
+            'segment': self.segment
+        }
+
+
+class ReportCacheEntry(db.Model):
+    __tablename__ = 'report_cache'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    report = db.Column(db.String(30), nullable=False)
+    range_start = db.Column(db.DateTime, nullable=False)
+    range_end = db.Column(db.DateTime, nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('report', 'range_start', 'range_end', name='uq_report_cache_key'),
+    )
+
+
+class ReportCacheEpoch(db.Model):
+    __tablename__ = 'report_cache_epochs'
+    
+    source = db.Column(db.String(20), primary_key=True)
+    epoch = db.Column(db.BigInteger, nullable=False, default=0)
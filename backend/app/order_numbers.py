@@ -0,0 +1,89 @@
+"""
+Order number allocation
+
+Numbers look like ORD-261016-000123: a readable date prefix followed by a
+counter that is unique across the whole shop, so any number of orders per
+second (and whole offline batches) never collide on orders.order_number.
+
+On PostgreSQL the counter is order_number_seq, which increments by
+ORDER_NUMBER_BLOCK_SIZE. Each worker process takes a whole block with one
+nextval() and hands the numbers out from memory; blocks never overlap, so
+workers never collide. Unused numbers in a block are lost on restart, which
+only leaves gaps.
+
+Databases without sequences (SQLite test runs) bump order_number_counter
+inside the caller's transaction instead, one exact range per call.
+"""
+
+import os
+import threading
+from datetime import datetime
+from app import db
+from app.models import ORDER_NUMBER_BLOCK_SIZE, order_number_seq, OrderNumberCounter
+
+
+class OrderNumberAllocator:
+    """Per-process hi/lo allocator over order_number_seq"""
+
+    def __init__(self, block_size=ORDER_NUMBER_BLOCK_SIZE):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._next = 0
+        self._limit = 0
+
+    def allocate(self, count):
+        """Return count unique counter values"""
+        values = []
+        with self._lock:
+            # A block fetched before a fork must not be shared with the children
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._next = self._limit = 0
+
+            while len(values) < count:
+                if self._next >= self._limit:
+                    self._next = self._next_block()
+                    self._limit = self._next + self.block_size
+                take = min(count - len(values), self._limit - self._next)
+                values.extend(range(self._next, self._next + take))
+                self._next += take
+
+        return values
+
+    def _next_block(self):
+        """First value of a fresh block from order_number_seq"""
+        # nextval() is non-transactional, so a rollback cannot hand the block out twice
+        return db.session.execute(order_number_seq.next_value()).scalar()
+
+
+_allocator = OrderNumberAllocator()
+
+
+def _counter_values(count):
+    """Reserve count values from order_number_counter in the current transaction"""
+    next_value = db.session.execute(
+        db.update(OrderNumberCounter)
+        .where(OrderNumberCounter.id == 1)
+        .values(next_value=OrderNumberCounter.next_value + count)
+        .returning(OrderNumberCounter.next_value),
+        execution_options={'synchronize_session': False}
+    ).scalar()
+
+    if next_value is None:
+        db.session.add(OrderNumberCounter(id=1, next_value=count + 1))
+        db.session.flush()
+        next_value = count + 1
+
+    return list(range(next_value - count, next_value))
+
+
+def allocate_order_numbers(count):
+    """Return count new, unique order numbers"""
+    if db.session.get_bind().dialect.supports_sequences:
+        values = _allocator.allocate(count)
+    else:
+        values = _counter_values(count)
+
+    prefix = datetime.now().strftime('%y%m%d')
+    return [f'ORD-{prefix}-{value:06d}' for value in values]
@@ -0,0 +1,70 @@
+"""
+Keyset (cursor) pagination
+
+List endpoints accept an opt-in ?cursor= parameter. An empty cursor starts
+from the newest row; each response carries an opaque next_cursor that
+encodes the (sort value, id) of the last row returned, so every page is a
+bounded index range scan instead of OFFSET/LIMIT plus COUNT(*).
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from app import db
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort_value, row_id):
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, as_datetime=True):
+    """(sort value, id) from cursor; the sort value is an ISO datetime, or a number if not as_datetime"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(payload)
+        if sort_value is not None:
+            if as_datetime:
+                sort_value = datetime.fromisoformat(sort_value)
+            elif isinstance(sort_value, bool) or not isinstance(sort_value, (int, float)):
+                raise TypeError(sort_value)
+        return sort_value, int(row_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+def keyset_paginate(query, sort_column, id_column, cursor, per_page, nulls_last=False):
+    """
+    Return (items, next_cursor) for query ordered by sort_column DESC, id DESC.
+    Set nulls_last when sort_column is nullable and NULL rows should come last.
+    """
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, isinstance(sort_column.type, db.DateTime))
+        if sort_value is None:
+            query = query.filter(sort_column.is_(None), id_column < last_id)
+        else:
+            after = db.or_(
+                sort_column < sort_value,
+                db.and_(sort_column == sort_value, id_column < last_id)
+            )
+            if nulls_last:
+                after = db.or_(after, sort_column.is_(None))
+            query = query.filter(after)
+
+    order = sort_column.desc().nullslast() if nulls_last else sort_column.desc()
+    items = query.order_by(order, id_column.desc()).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+    return items, next_cursor
@@ -0,0 +1,113 @@
+"""
+Password hashing
+
+The algorithm and cost come from PASSWORD_HASH_METHOD:
+    scrypt:<n>:<r>:<p>           e.g. scrypt:32768:8:1 (Werkzeug default)
+    pbkdf2:<hash>:<iterations>   e.g. pbkdf2:sha256:600000
+    bcrypt:<rounds>              e.g. bcrypt:12
+
+Stored hashes that use other parameters still verify, and login rehashes
+them with the configured method (needs_rehash).
+
+Hashing and verification are CPU-bound, so they run on a bounded
+per-process thread pool (PASSWORD_HASH_WORKERS). A burst of logins at shift
+change then queues there instead of occupying every request thread. At most
+PASSWORD_HASH_QUEUE_SIZE hashes wait behind the running ones; past that, or
+when a result takes longer than PASSWORD_HASH_TIMEOUT, the request fails
+fast with PasswordHasherBusy.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import bcrypt
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Werkzeug's defaults when a method is given without parameters
+DEFAULT_METHODS = {
+    'scrypt': 'scrypt:32768:8:1',
+    'pbkdf2': 'pbkdf2:sha256:600000',
+    'bcrypt': 'bcrypt:12'
+}
+
+
+class PasswordHasherBusy(RuntimeError):
+    pass
+
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+# Running plus queued hashes; a slot is only freed when its hash finishes
+_slots = None
+
+
+def _get_executor():
+    global _executor, _executor_pid, _slots
+    with _lock:
+        # Thread pools do not survive fork; build one per worker process
+        if _executor is None or _executor_pid != os.getpid():
+            workers = current_app.config.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 2
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            _slots = threading.BoundedSemaphore(workers + current_app.config.get('PASSWORD_HASH_QUEUE_SIZE', 32))
+            _executor_pid = os.getpid()
+        return _executor, _slots
+
+
+def _run(fn, *args):
+    executor, slots = _get_executor()
+    if not slots.acquire(blocking=False):
+        raise PasswordHasherBusy('Password hashing queue is full')
+
+    future = executor.submit(fn, *args)
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=current_app.config.get('PASSWORD_HASH_TIMEOUT', 10))
+    except TimeoutError:
+        # Drops the hash if it has not started yet; one that is already
+        # running cannot be stopped and keeps its slot until it finishes
+        future.cancel()
+        raise PasswordHasherBusy('Timed out waiting for password hashing')
+
+
+def configured_method():
+    method = current_app.config.get('PASSWORD_HASH_METHOD') or 'scrypt'
+    return DEFAULT_METHODS.get(method, method)
+
+
+def _stored_method(password_hash):
+    if password_hash.startswith('$2'):
+        # $2b$<rounds>$...
+        return f"bcrypt:{int(password_hash.split('$')[2])}"
+    return password_hash.split('$', 1)[0]
+
+
+def _hash(password, method):
+    if method.startswith('bcrypt:'):
+        rounds = int(method.split(':', 1)[1])
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('ascii')
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash, password):
+    if password_hash.startswith('$2'):
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('ascii'))
+    return check_password_hash(password_hash, password)
+
+
+def hash_password(password):
+    """Hash password with the configured method"""
+    return _run(_hash, password, configured_method())
+
+
+def verify_password(password_hash, password):
+    """Check password against any supported stored hash"""
+    if not password_hash:
+        return False
+    return _run(_verify, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """True when password_hash was made with different parameters than configured"""
+    return _stored_method(password_hash) != configured_method()
@@ -0,0 +1,110 @@
+"""
+Compact list projections
+
+List endpoints accept ?view=summary or ?fields=a,b,c. Either one switches
+the endpoint from hydrating full ORM objects (with nested customer and
+items) to a column-only SELECT of just the requested fields, returned as
+flat dicts. Without either parameter the response is unchanged.
+
+Field names are the keys of ORDER_FIELDS / CUSTOMER_FIELDS; customer_name,
+customer_phone and item_count are flattened from the related tables.
+"""
+
+from datetime import date, datetime
+from sqlalchemy import func
+from app import db
+from app.models import Customer, Order, OrderItem
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+ORDER_FIELDS = {
+    'id': Order.id,
+    'order_number': Order.order_number,
+    'customer_id': Order.customer_id,
+    'customer_name': Customer.name,
+    'customer_phone': Customer.phone,
+    'user_id': Order.user_id,
+    'total_amount': Order.total_amount,
+    'discount': Order.discount,
+    'final_amount': Order.final_amount,
+    'payment_method': Order.payment_method,
+    'payment_status': Order.payment_status,
+    'status': Order.status,
+    'notes': Order.notes,
+    'item_count': db.select(func.count(OrderItem.id)).where(
+        OrderItem.order_id == Order.id
+    ).correlate(Order).scalar_subquery(),
+    'created_at': Order.created_at,
+    'completed_at': Order.completed_at
+}
+
+ORDER_SUMMARY = [
+    'id', 'order_number', 'customer_name', 'final_amount',
+    'payment_status', 'status', 'created_at'
+]
+
+CUSTOMER_FIELDS = {
+    'id': Customer.id,
+    'name': Customer.name,
+    'email': Customer.email,
+    'phone': Customer.phone,
+    'address': Customer.address,
+    'account_balance': Customer.account_balance,
+    'total_spent': Customer.total_spent,
+    'created_at': Customer.created_at,
+    'last_visit': Customer.last_visit
+}
+
+CUSTOMER_SUMMARY = ['id', 'name', 'phone', 'account_balance', 'last_visit']
+
+
+def requested_fields(args, available, summary):
+    """
+    Field list asked for by ?fields= (takes precedence) or ?view=summary,
+    or None for the full representation.
+    """
+    fields = args.get('fields')
+    if fields:
+        names = list(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+        unknown = [name for name in names if name not in available]
+        if unknown or not names:
+            raise InvalidFields(f"Unknown fields: {', '.join(unknown)}" if unknown else 'No fields given')
+        return names
+
+    view = args.get('view', 'full')
+    if view == 'summary':
+        return list(summary)
+    if view != 'full':
+        raise InvalidFields(f'Invalid view: {view}')
+    return None
+
+
+def project(query, available, fields, required=()):
+    """
+    Turn an unfiltered ORM query into a column-only query of fields; apply
+    filters afterwards. required names are selected as well (e.g. the keyset
+    sort columns) but not serialized.
+    """
+    names = list(dict.fromkeys(list(fields) + list(required)))
+    query = query.with_entities(*[available[name].label(name) for name in names])
+    if available is ORDER_FIELDS:
+        # Anchor FROM on orders: the selected columns alone may not name it
+        query = query.select_from(Order)
+        if {'customer_name', 'customer_phone'} & set(names):
+            query = query.outerjoin(Customer, Order.customer_id == Customer.id)
+    return query
+
+
+def row_dict(row, fields):
+    """Serialize a projected row; dates as ISO strings like the models' to_dict()"""
+    mapping = row._mapping
+    result = {}
+    for name in fields:
+        value = mapping[name]
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        result[name] = value
+    return result
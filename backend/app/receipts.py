@@ -0,0 +1,205 @@
+"""
+PDF receipts
+
+Receipts are rendered with the reportlab canvas on an 80 mm roll. The
+business header (wrapped lines, fonts, measured widths) is laid out once per
+process by receipt_template() and reused for every receipt.
+
+Rendering works on plain receipt dicts (see receipt_data), so batches can be
+handed to a process pool: render_receipts() spreads large batches over
+RECEIPT_RENDER_WORKERS processes and renders small ones in-process.
+"""
+
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas
+from config import Config
+
+PAGE_WIDTH = 80 * mm
+MARGIN = 4 * mm
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+
+FONT = 'Helvetica'
+FONT_BOLD = 'Helvetica-Bold'
+BODY_SIZE = 8
+BODY_LEADING = 10
+
+# Below this many receipts the process pool costs more than it saves
+MIN_POOL_BATCH = 20
+
+
+def business_info():
+    """Business header details from Config"""
+    return {
+        'name': Config.BUSINESS_NAME,
+        'email': Config.BUSINESS_EMAIL,
+        'phone': Config.BUSINESS_PHONE,
+        'address': Config.BUSINESS_ADDRESS,
+        'hours': Config.BUSINESS_HOURS
+    }
+
+
+def receipt_data(order):
+    """Picklable receipt payload for an order; also the JSON receipt body"""
+    return {
+        'business': business_info(),
+        'order': order.to_dict(),
+        'generated_at': datetime.utcnow().isoformat()
+    }
+
+
+def _money(amount):
+    return f'KSh {amount or 0:,.2f}'
+
+
+class ReceiptTemplate:
+    """Pre-laid-out business header plus the drawing routine for one receipt"""
+
+    def __init__(self, business):
+        self.header = []
+        for text, font, size in (
+            (business.get('name'), FONT_BOLD, 11),
+            (business.get('address'), FONT, 7),
+            (self._contact_line(business), FONT, 7)
+        ):
+            for line in simpleSplit(text or '', font, size, CONTENT_WIDTH):
+                self.header.append((line, font, size, size + 3))
+        self.header_height = sum(leading for *_, leading in self.header) + 8
+
+        self.footer = [('Thank you for your business!', FONT_BOLD, 8, 11)]
+        if business.get('hours'):
+            for line in simpleSplit(f"Open Hours: {business['hours']}", FONT, 7, CONTENT_WIDTH):
+                self.footer.append((line, FONT, 7, 10))
+        self.footer_height = sum(leading for *_, leading in self.footer) + 8
+
+        self.qty_x = MARGIN + CONTENT_WIDTH * 0.58
+        self.name_width = self.qty_x - MARGIN - 2 * mm
+
+    @staticmethod
+    def _contact_line(business):
+        parts = []
+        if business.get('email'):
+            parts.append(f"Email: {business['email']}")
+        if business.get('phone'):
+            parts.append(f"Phone: {business['phone']}")
+        return ' | '.join(parts)
+
+    def _body_lines(self, order):
+        """(left, right, bold) rows below the header, with item names wrapped"""
+        created_at = order.get('created_at')
+        lines = [(f"Order #: {order['order_number']}", None, True)]
+        if created_at:
+            lines.append((f"Date: {datetime.fromisoformat(created_at):%d/%m/%Y %H:%M}", None, False))
+        if order.get('customer'):
+            lines.append((f"Customer: {order['customer']['name']}", None, False))
+        lines.append(None)
+
+        for item in order.get('items', []):
+            names = simpleSplit(item['item_name'] or '', FONT, BODY_SIZE, self.name_width) or ['']
+            lines.append((names[0], (item['quantity'], item['total_price']), False))
+            lines.extend((name, None, False) for name in names[1:])
+        lines.append(None)
+
+        lines.append(('Subtotal', _money(order['total_amount']), False))
+        if order.get('discount'):
+            lines.append(('Discount', _money(order['discount']), False))
+        lines.append(('Total', _money(order['final_amount']), True))
+        lines.append(('Payment', f"{order['payment_method']} / {order['payment_status']}".upper(), False))
+        return lines
+
+    def _draw_centered(self, pdf, lines, y):
+        for text, font, size, leading in lines:
+            y -= leading
+            pdf.setFont(font, size)
+            pdf.drawCentredString(PAGE_WIDTH / 2, y, text)
+        return y
+
+    def _draw_rule(self, pdf, y):
+        pdf.line(MARGIN, y, PAGE_WIDTH - MARGIN, y)
+
+    def render(self, receipt):
+        """PDF bytes for one receipt dict"""
+        lines = self._body_lines(receipt['order'])
+        height = 2 * MARGIN + self.header_height + self.footer_height + BODY_LEADING * len(lines)
+
+        buffer = io.BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=(PAGE_WIDTH, height), pageCompression=1)
+        pdf.setTitle(f"Receipt - {receipt['order']['order_number']}")
+
+        y = self._draw_centered(pdf, self.header, height - MARGIN) - 4
+        self._draw_rule(pdf, y)
+        y -= 4
+
+        right = PAGE_WIDTH - MARGIN
+        for line in lines:
+            y -= BODY_LEADING
+            if line is None:
+                self._draw_rule(pdf, y + BODY_LEADING / 2)
+                continue
+            left, value, bold = line
+            pdf.setFont(FONT_BOLD if bold else FONT, BODY_SIZE)
+            pdf.drawString(MARGIN, y, left)
+            if isinstance(value, tuple):
+                quantity, total = value
+                pdf.drawString(self.qty_x, y, f'x{quantity}')
+                pdf.drawRightString(right, y, _money(total))
+            elif value is not None:
+                pdf.drawRightString(right, y, value)
+
+        y -= 4
+        self._draw_rule(pdf, y)
+        self._draw_centered(pdf, self.footer, y - 4)
+
+        pdf.showPage()
+        pdf.save()
+        return buffer.getvalue()
+
+
+@lru_cache(maxsize=4)
+def _template(business_items):
+    return ReceiptTemplate(dict(business_items))
+
+
+def receipt_template(business):
+    """The per-process template for this business header"""
+    return _template(tuple(sorted(business.items())))
+
+
+def render_receipt(receipt):
+    return receipt_template(receipt['business']).render(receipt)
+
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def _get_pool(workers):
+    global _pool, _pool_pid
+    with _lock:
+        # A pool inherited over fork belongs to the parent; build one per worker process
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                # Request threads may hold locks at fork time; start clean interpreters
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def render_receipts(receipts, workers=None):
+    """PDF bytes for each receipt dict, in order"""
+    workers = workers or os.cpu_count() or 1
+    if workers < 2 or len(receipts) < MIN_POOL_BATCH:
+        return [render_receipt(receipt) for receipt in receipts]
+
+    chunksize = max(1, len(receipts) // (workers * 4))
+    return list(_get_pool(workers).map(render_receipt, receipts, chunksize=chunksize))
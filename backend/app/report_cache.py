@@ -0,0 +1,179 @@
+"""
+Closed-period report cache
+
+Reports over past days are cached in the report_cache table, keyed on the
+report name and the exact range. cached_rows() splits a requested range at
+the start of the current day: the closed part is read from (or stored to)
+the cache, the open tail is always computed live.
+
+Past days are not strictly immutable: orders can be backdated or edited,
+and old expenses can be changed or deleted. Every such write calls
+invalidate() inside its own transaction. That deletes the cached entries
+whose range contains the touched timestamp and bumps the epoch of the
+source table. A result is stored only if the epoch is still the one read
+before computing, and the epoch row is locked FOR SHARE. So a result that
+raced with a backdated write is returned but never cached.
+
+Hit, miss and invalidation counters are kept per process, see
+report_cache_stats and /api/reports/cache-stats.
+"""
+
+import json
+import threading
+from datetime import datetime, time, timedelta
+from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db
+from app.models import ReportCacheEntry, ReportCacheEpoch
+
+# Report name -> table whose writes invalidate it
+REPORT_SOURCES = {
+    'sales': 'orders',
+    'services': 'orders',
+    'expenses': 'expenses',
+    'expenses_by_day': 'expenses',
+    'expenses_by_week': 'expenses',
+    'expenses_by_month': 'expenses'
+}
+
+# A day counts as closed this long after midnight, so writes that were still
+# in flight at midnight have committed (and invalidated) before it is cached
+CLOSE_GRACE = timedelta(minutes=10)
+
+# Entries for ranges nobody asks for again are dropped after this long
+ENTRY_MAX_AGE = timedelta(days=30)
+
+
+class ReportCacheStats:
+    """Per-report hit/miss/invalidation counters for this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def record(self, report, outcome, count=1):
+        with self._lock:
+            counters = self._counters.setdefault(report, {'hits': 0, 'misses': 0, 'invalidations': 0})
+            counters[outcome] += count
+
+    def snapshot(self):
+        with self._lock:
+            return {report: dict(counters) for report, counters in self._counters.items()}
+
+
+report_cache_stats = ReportCacheStats()
+
+
+def _insert(model):
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql_insert(model)
+    if dialect == 'sqlite':
+        return sqlite_insert(model)
+    return None
+
+
+def _current_epoch(source):
+    epoch = db.session.query(ReportCacheEpoch.epoch).filter_by(source=source).scalar()
+    if epoch is not None:
+        return epoch
+
+    insert = _insert(ReportCacheEpoch)
+    if insert is not None:
+        db.session.execute(insert.values(source=source, epoch=0).on_conflict_do_nothing())
+    else:
+        db.session.add(ReportCacheEpoch(source=source, epoch=0))
+        db.session.flush()
+    return db.session.query(ReportCacheEpoch.epoch).filter_by(source=source).scalar()
+
+
+def _store(report, start, end, epoch, rows):
+    """Cache rows unless a write to the source has bumped its epoch since epoch was read"""
+    now = datetime.utcnow()
+    columns = ['report', 'range_start', 'range_end', 'payload', 'created_at']
+    guarded = db.select(
+        db.literal(report),
+        db.literal(start, db.DateTime),
+        db.literal(end, db.DateTime),
+        db.literal(json.dumps(rows)),
+        db.literal(now, db.DateTime)
+    ).select_from(ReportCacheEpoch).where(
+        ReportCacheEpoch.source == REPORT_SOURCES[report],
+        ReportCacheEpoch.epoch == epoch
+    ).with_for_update(read=True)
+
+    insert = _insert(ReportCacheEntry)
+    if insert is not None:
+        db.session.execute(insert.from_select(columns, guarded).on_conflict_do_nothing())
+    else:
+        db.session.execute(db.insert(ReportCacheEntry).from_select(columns, guarded))
+
+    ReportCacheEntry.query.filter(
+        ReportCacheEntry.created_at < now - ENTRY_MAX_AGE
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _closed_rows(report, start, end, compute):
+    payload = db.session.query(ReportCacheEntry.payload).filter_by(
+        report=report, range_start=start, range_end=end
+    ).scalar()
+    if payload is not None:
+        report_cache_stats.record(report, 'hits')
+        return json.loads(payload)
+
+    report_cache_stats.record(report, 'misses')
+    epoch = _current_epoch(REPORT_SOURCES[report])
+    rows = compute(start, end)
+    _store(report, start, end, epoch, rows)
+    return rows
+
+
+def cached_rows(report, start, end, compute):
+    """
+    Rows of report over the inclusive range [start, end].
+
+    compute(start, end) must return JSON-serializable rows that can simply be
+    concatenated across sub-ranges; the caller folds them.
+    """
+    cutoff = datetime.combine((datetime.utcnow() - CLOSE_GRACE).date(), time.min)
+    rows = []
+
+    if start < cutoff:
+        rows.extend(_closed_rows(report, start, min(end, cutoff - timedelta(microseconds=1)), compute))
+    if end >= cutoff:
+        rows.extend(compute(max(start, cutoff), end))
+
+    return rows
+
+
+def invalidate(source, *timestamps):
+    """
+    Drop cached ranges of every report over source ('orders' or 'expenses')
+    that contain any of timestamps. Call inside the writing transaction.
+    """
+    today = datetime.combine(datetime.utcnow().date(), time.min)
+    closed = {ts for ts in timestamps if ts is not None and ts < today}
+    if not closed:
+        return
+
+    # Bumping the epoch also takes the row lock that concurrent _store() calls wait on
+    bumped = db.session.execute(
+        db.update(ReportCacheEpoch)
+        .where(ReportCacheEpoch.source == source)
+        .values(epoch=ReportCacheEpoch.epoch + 1)
+    ).rowcount
+    if not bumped:
+        db.session.add(ReportCacheEpoch(source=source, epoch=1))
+
+    for report in [report for report, report_source in REPORT_SOURCES.items() if report_source == source]:
+        deleted = ReportCacheEntry.query.filter(
+            ReportCacheEntry.report == report,
+            or_(*[
+                (ReportCacheEntry.range_start <= ts) & (ReportCacheEntry.range_end >= ts)
+                for ts in closed
+            ])
+        ).delete(synchronize_session=False)
+        if deleted:
+            report_cache_stats.record(report, 'invalidations', deleted)
@@ -0,0 +1,210 @@
+"""
+Daily sales rollup maintenance
+
+The daily_sales_rollup table holds one row per
+date x payment_method x payment_status x status with the number of orders
+and the sum of their final_amount. The order routes keep it current inside
+their own transaction, and the reports read whole days from it instead of
+scanning the orders table. Every change is also applied to the monthly
+ledger and invalidates cached report ranges that contain the order (see
+ledger and report_cache).
+
+Rebuild from the orders table with:
+flask rebuild-rollups
+"""
+
+from datetime import date, datetime, time, timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, or_, union_all
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db, ledger, report_cache
+from app.models import Order, DailySalesRollup
+
+ROLLUP_KEY = ['sale_date', 'payment_method', 'payment_status', 'status']
+
+
+def _order_key(order):
+    return {
+        'sale_date': order.created_at.date(),
+        'payment_method': order.payment_method,
+        'payment_status': order.payment_status or 'pending',
+        'status': order.status or 'pending'
+    }
+
+
+def _bump(key, count, amount):
+    """Atomically add count/amount to the rollup row for key"""
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+        stmt = insert(DailySalesRollup).values(order_count=count, total_sales=amount, **key)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=ROLLUP_KEY,
+            set_={
+                'order_count': DailySalesRollup.order_count + stmt.excluded.order_count,
+                'total_sales': DailySalesRollup.total_sales + stmt.excluded.total_sales
+            }
+        )
+        db.session.execute(stmt)
+        return
+
+    updated = DailySalesRollup.query.filter_by(**key).update({
+        'order_count': DailySalesRollup.order_count + count,
+        'total_sales': DailySalesRollup.total_sales + amount
+    }, synchronize_session=False)
+    if not updated:
+        db.session.add(DailySalesRollup(order_count=count, total_sales=amount, **key))
+
+
+def apply_order(order):
+    """Add an order to the rollup. The order must be flushed (created_at set)."""
+    _bump(_order_key(order), 1, order.final_amount or 0)
+    ledger.apply_orders([order])
+    report_cache.invalidate('orders', order.created_at)
+
+
+def apply_orders(orders):
+    """Add many flushed orders to the rollup with one upsert per rollup key"""
+    totals = {}
+    for order in orders:
+        key = tuple(_order_key(order).items())
+        count, amount = totals.get(key, (0, 0))
+        totals[key] = (count + 1, amount + (order.final_amount or 0))
+
+    for key, (count, amount) in totals.items():
+        _bump(dict(key), count, amount)
+    ledger.apply_orders(orders)
+    report_cache.invalidate('orders', *[order.created_at for order in orders])
+
+
+def unapply_order(order):
+    """Remove an order from the rollup before its payment_status/status change"""
+    _bump(_order_key(order), -1, -(order.final_amount or 0))
+    ledger.apply_orders([order], sign=-1)
+    report_cache.invalidate('orders', order.created_at)
+
+
+def _as_date(value):
+    # func.date() returns a string on SQLite and a date on PostgreSQL
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _split_range(start_date, end_date):
+    """
+    Split the inclusive range [start_date, end_date] into the whole days
+    covered by the rollup and the partial-day edges that must be read live.
+    Returns ((first_day, last_day) or None, [SQL conditions for each edge]).
+    """
+    first_day = start_date.date() if start_date.time() == time.min else start_date.date() + timedelta(days=1)
+    last_day = end_date.date() if end_date.time() == time.max else end_date.date() - timedelta(days=1)
+
+    if first_day > last_day:
+        return None, [(Order.created_at >= start_date) & (Order.created_at <= end_date)]
+
+    edges = []
+    head_end = datetime.combine(first_day, time.min)
+    if start_date < head_end:
+        edges.append((Order.created_at >= start_date) & (Order.created_at < head_end))
+    tail_start = datetime.combine(last_day + timedelta(days=1), time.min)
+    if end_date >= tail_start:
+        edges.append((Order.created_at >= tail_start) & (Order.created_at <= end_date))
+
+    return (first_day, last_day), edges
+
+
+def paid_sales_breakdown(start_date, end_date):
+    """
+    Paid sales in [start_date, end_date] as (date, payment_method, orders, sales)
+    rows. Whole days come from the rollup, partial days from the orders table,
+    combined with UNION ALL so the range costs a single statement.
+    """
+    days, edges = _split_range(start_date, end_date)
+    selects = []
+
+    if days:
+        selects.append(db.select(
+            DailySalesRollup.sale_date,
+            DailySalesRollup.payment_method,
+            func.sum(DailySalesRollup.order_count),
+            func.sum(DailySalesRollup.total_sales)
+        ).where(
+            DailySalesRollup.sale_date >= days[0],
+            DailySalesRollup.sale_date <= days[1],
+            DailySalesRollup.payment_status == 'paid'
+        ).group_by(
+            DailySalesRollup.sale_date, DailySalesRollup.payment_method
+        ))
+
+    if edges:
+        # Edges fall on different days, so one live aggregate covers both
+        selects.append(db.select(
+            func.date(Order.created_at),
+            Order.payment_method,
+            func.count(Order.id),
+            func.sum(Order.final_amount)
+        ).where(
+            or_(*edges),
+            Order.payment_status == 'paid'
+        ).group_by(
+            func.date(Order.created_at), Order.payment_method
+        ))
+
+    stmt = selects[0] if len(selects) == 1 else union_all(*selects)
+
+    return [
+        (_as_date(row[0]), row[1], int(row[2] or 0), float(row[3] or 0))
+        for row in db.session.execute(stmt)
+        if row[2]
+    ]
+
+
+def paid_sales_totals(start_date, end_date):
+    """Return (orders, sales) for paid orders in [start_date, end_date]"""
+    rows = paid_sales_breakdown(start_date, end_date)
+    return sum(row[2] for row in rows), sum(row[3] for row in rows)
+
+
+def rebuild():
+    """Replace the rollup contents with aggregates computed from the orders table"""
+    DailySalesRollup.query.delete(synchronize_session=False)
+
+    source = db.session.query(
+        func.date(Order.created_at),
+        Order.payment_method,
+        func.coalesce(Order.payment_status, 'pending'),
+        func.coalesce(Order.status, 'pending'),
+        func.count(Order.id),
+        func.coalesce(func.sum(Order.final_amount), 0)
+    ).filter(
+        Order.created_at.isnot(None)
+    ).group_by(
+        func.date(Order.created_at),
+        Order.payment_method,
+        func.coalesce(Order.payment_status, 'pending'),
+        func.coalesce(Order.status, 'pending')
+    )
+
+    db.session.execute(
+        DailySalesRollup.__table__.insert().from_select(
+            ROLLUP_KEY + ['order_count', 'total_sales'],
+            source.statement
+        )
+    )
+    db.session.commit()
+
+    return DailySalesRollup.query.count()
+
+
+@click.command('rebuild-rollups')
+@with_appcontext
+def rebuild_rollups_command():
+    """Rebuild daily_sales_rollup from the orders table."""
+    rows = rebuild()
+    click.echo(f'✓ daily_sales_rollup rebuilt ({rows} rows)')
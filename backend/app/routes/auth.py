@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
 from app import db
 from app.models import User
+from app.passwords import PasswordHasherBusy
+from app.security import role_required, token_claims, token_versions, revoke_user_tokens
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -29,7 +31,10 @@ def register():
         role=data['role'],
         phone=data.get('phone')
     )
-    user.set_password(data['password'])
+    try:
+        user.set_password(data['password'])
+    except PasswordHasherBusy:
+        return jsonify({'error': 'Server busy, please try again'}), 503
     
     db.session.add(user)
     db.session.commit()
@@ -55,14 +60,23 @@ def login():
 
     user = User.query.filter_by(username=username).first()
 
-    if not user or not user.check_password(password):
-        return jsonify({'error': 'Invalid credentials'}), 401
+    try:
+        if not user or not user.check_password(password):
+            return jsonify({'error': 'Invalid credentials'}), 401
 
-    if not user.is_active:
-        return jsonify({'error': 'Account is deactivated'}), 403
+        if not user.is_active:
+            return jsonify({'error': 'Account is deactivated'}), 403
 
-    access_token = create_access_token(identity=user.id)
-    refresh_token = create_refresh_token(identity=user.id)
+        # Upgrade hashes made with outdated parameters while we have the plaintext
+        if user.password_needs_rehash():
+            user.set_password(password)
+            db.session.commit()
+    except PasswordHasherBusy:
+        return jsonify({'error': 'Server busy, please try again'}), 503
+
+    claims = token_claims(user)
+    access_token = create_access_token(identity=user.id, additional_claims=claims)
+    refresh_token = create_refresh_token(identity=user.id, additional_claims=claims)
 
     return jsonify({
         'message': 'Login successful',
@@ -77,7 +91,13 @@ def login():
 @jwt_required(refresh=True)
 def refresh():
     current_user_id = get_jwt_identity()
-    access_token = create_access_token(identity=current_user_id)
+    
+    # Refresh is rare, so re-read the user to pick up role changes
+    user = User.query.get(current_user_id)
+    if not user or not user.is_active:
+        return jsonify({'error': 'Account is deactivated'}), 403
+    
+    access_token = create_access_token(identity=current_user_id, additional_claims=token_claims(user))
     return jsonify({'access_token': access_token}), 200
 
 
@@ -94,15 +114,8 @@ def get_current_user():
 
 
 @bp.route('/users', methods=['GET'])
-@jwt_required()
+@role_required('owner')
 def get_all_users():
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    # Only owner can view all users
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
     users = User.query.all()
     return jsonify({'users': [user.to_dict() for user in users]}), 200
 
@@ -111,10 +124,10 @@ def get_all_users():
 @jwt_required()
 def update_user(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    is_owner = get_jwt().get('role') == 'owner'
     
     # Only owner can update users or users can update themselves
-    if current_user.role != 'owner' and current_user_id != user_id:
+    if not is_owner and current_user_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
     user = User.query.get(user_id)
@@ -129,12 +142,19 @@ def update_user(user_id):
         user.email = data['email']
     if 'phone' in data:
         user.phone = data['phone']
-    if 'is_active' in data and current_user.role == 'owner':
+    if 'is_active' in data and is_owner and data['is_active'] != user.is_active:
         user.is_active = data['is_active']
+        revoke_user_tokens(user)
     if 'password' in data:
-        user.set_password(data['password'])
+        try:
+            user.set_password(data['password'])
+        except PasswordHasherBusy:
+            # Drop the other changes too rather than apply half the update
+            db.session.rollback()
+            return jsonify({'error': 'Server busy, please try again'}), 503
     
     db.session.commit()
+    token_versions.set(user)
     
     return jsonify({
         'message': 'User updated successfully',
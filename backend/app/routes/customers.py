@@ -1,8 +1,13 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from datetime import datetime
-from app import db
+from sqlalchemy import func
+from app import db, ledger
 from app.models import Customer, Order
+from app.pagination import keyset_paginate, InvalidCursor
+from app.projections import CUSTOMER_FIELDS, CUSTOMER_SUMMARY, InvalidFields, requested_fields, project, row_dict
+from app.search import customer_search_filter, customer_search_query
+from app.security import role_required
 
 bp = Blueprint('customers', __name__, url_prefix='/api/customers')
 
@@ -13,18 +18,40 @@ def get_customers():
     search = request.args.get('search', '')
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    cursor = request.args.get('cursor')
     
-    query = Customer.query
+    try:
+        fields = requested_fields(request.args, CUSTOMER_FIELDS, CUSTOMER_SUMMARY)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if fields:
+        # Column-only select of the requested fields; the cursor needs last_visit and id
+        query = project(Customer.query, CUSTOMER_FIELDS, fields, required=['last_visit', 'id'])
+        serialize = lambda row: row_dict(row, fields)
+    else:
+        query = Customer.query
+        serialize = lambda customer: customer.to_dict()
     
     if search:
-        search_pattern = f'%{search}%'
-        query = query.filter(
-            db.or_(
-                Customer.name.ilike(search_pattern),
-                Customer.phone.ilike(search_pattern),
-                Customer.email.ilike(search_pattern)
+        query = query.filter(customer_search_filter(search))
+    
+    # Keyset mode: constant cost per page, total only on request
+    if cursor is not None:
+        try:
+            customers, next_cursor = keyset_paginate(
+                query, Customer.last_visit, Customer.id, cursor, per_page, nulls_last=True
             )
-        )
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        response = {
+            'customers': [serialize(customer) for customer in customers],
+            'next_cursor': next_cursor
+        }
+        if request.args.get('include_total', 'false').lower() == 'true':
+            response['total'] = query.count()
+        return jsonify(response), 200
     
     # Order by last visit
     query = query.order_by(Customer.last_visit.desc().nullslast())
@@ -32,7 +59,7 @@ def get_customers():
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
-        'customers': [customer.to_dict() for customer in pagination.items],
+        'customers': [serialize(customer) for customer in pagination.items],
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
@@ -48,7 +75,7 @@ def get_customer(customer_id):
         return jsonify({'error': 'Customer not found'}), 404
     
     # Get customer's recent orders
-    recent_orders = Order.query.filter_by(customer_id=customer_id)\
+    recent_orders = Order.query_with_details().filter_by(customer_id=customer_id)\
         .order_by(Order.created_at.desc())\
         .limit(10)\
         .all()
@@ -83,6 +110,8 @@ def create_customer():
     )
     
     db.session.add(customer)
+    db.session.flush()
+    ledger.apply_customer(customer)
     db.session.commit()
     
     return jsonify({
@@ -141,15 +170,19 @@ def update_balance(customer_id):
     amount = float(data['amount'])
     operation = data.get('operation', 'add')  # add or deduct
     
+    # Atomic in-database update; a deduct only applies if the balance covers it
+    balance = func.coalesce(Customer.account_balance, 0)
     if operation == 'add':
-        customer.account_balance += amount
+        update = db.update(Customer).where(Customer.id == customer_id).values(account_balance=balance + amount)
     elif operation == 'deduct':
-        if customer.account_balance < amount:
-            return jsonify({'error': 'Insufficient balance'}), 400
-        customer.account_balance -= amount
+        update = db.update(Customer).where(Customer.id == customer_id, balance >= amount).values(account_balance=balance - amount)
     else:
         return jsonify({'error': 'Invalid operation'}), 400
     
+    if not db.session.execute(update, execution_options={'synchronize_session': False}).rowcount:
+        db.session.rollback()
+        return jsonify({'error': 'Insufficient balance'}), 400
+    
     db.session.commit()
     
     return jsonify({
@@ -167,13 +200,8 @@ def search_customers():
     if len(query) < 2:
         return jsonify({'customers': []}), 200
     
-    search_pattern = f'%{query}%'
-    customers = Customer.query.filter(
-        db.or_(
-            Customer.name.ilike(search_pattern),
-            Customer.phone.ilike(search_pattern)
-        )
-    ).limit(10).all()
+    # Phone-prefix matches first, then by trigram similarity
+    customers = customer_search_query(query, include_email=False).limit(10).all()
     
     return jsonify({
         'customers': [customer.to_dict() for customer in customers]
@@ -181,17 +209,9 @@ def search_customers():
 
 
 @bp.route('/<int:customer_id>', methods=['DELETE'])
-@jwt_required()
+@role_required('owner')
 def delete_customer(customer_id):
     """Delete a customer"""
-    current_user_id = get_jwt_identity()
-    from app.models import User
-    current_user = User.query.get(current_user_id)
-    
-    # Only owner can delete customers
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
     customer = Customer.query.get(customer_id)
     if not customer:
         return jsonify({'error': 'Customer not found'}), 404
@@ -200,6 +220,7 @@ def delete_customer(customer_id):
     if customer.orders:
         return jsonify({'error': 'Cannot delete customer with existing orders'}), 400
     
+    ledger.unapply_customer(customer)
     db.session.delete(customer)
     db.session.commit()
     
@@ -1,27 +1,24 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
-from app import db
-from app.models import Expense, User
+from app import db, ledger, report_cache
+from app.models import Expense
+from app.pagination import keyset_paginate, InvalidCursor
+from app.security import role_required
+from app.catalog_cache import cached_json_response
 
 bp = Blueprint('expenses', __name__, url_prefix='/api/expenses')
 
 @bp.route('/', methods=['GET'])
-@jwt_required()
+@role_required('owner')
 def get_expenses():
     """Get all expenses"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    # Only owner can view expenses
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
     category = request.args.get('category')
     date_from = request.args.get('date_from')
     date_to = request.args.get('date_to')
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    cursor = request.args.get('cursor')
     
     query = Expense.query
     
@@ -32,6 +29,21 @@ def get_expenses():
     if date_to:
         query = query.filter(Expense.created_at <= datetime.fromisoformat(date_to))
     
+    # Keyset mode: constant cost per page, total only on request
+    if cursor is not None:
+        try:
+            expenses, next_cursor = keyset_paginate(query, Expense.created_at, Expense.id, cursor, per_page)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        response = {
+            'expenses': [expense.to_dict() for expense in expenses],
+            'next_cursor': next_cursor
+        }
+        if request.args.get('include_total', 'false').lower() == 'true':
+            response['total'] = query.count()
+        return jsonify(response), 200
+    
     query = query.order_by(Expense.created_at.desc())
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
@@ -44,15 +56,9 @@ def get_expenses():
 
 
 @bp.route('/<int:expense_id>', methods=['GET'])
-@jwt_required()
+@role_required('owner')
 def get_expense(expense_id):
     """Get a specific expense"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
     expense = Expense.query.get(expense_id)
     if not expense:
         return jsonify({'error': 'Expense not found'}), 404
@@ -61,15 +67,10 @@ def get_expense(expense_id):
 
 
 @bp.route('/', methods=['POST'])
-@jwt_required()
+@role_required('owner')
 def create_expense():
     """Create a new expense"""
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    # Only owner can create expenses
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
     
     data = request.get_json()
     
@@ -88,6 +89,9 @@ def create_expense():
     )
     
     db.session.add(expense)
+    db.session.flush()
+    ledger.apply_expense(expense)
+    report_cache.invalidate('expenses', expense.created_at)
     db.session.commit()
     
     return jsonify({
@@ -97,21 +101,17 @@ def create_expense():
 
 
 @bp.route('/<int:expense_id>', methods=['PUT'])
-@jwt_required()
+@role_required('owner')
 def update_expense(expense_id):
     """Update an expense"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
     expense = Expense.query.get(expense_id)
     if not expense:
         return jsonify({'error': 'Expense not found'}), 404
     
     data = request.get_json()
     
+    ledger.unapply_expense(expense)
+    
     if 'category' in data:
         expense.category = data['category']
     if 'description' in data:
@@ -123,6 +123,8 @@ def update_expense(expense_id):
     if 'receipt_number' in data:
         expense.receipt_number = data['receipt_number']
     
+    ledger.apply_expense(expense)
+    report_cache.invalidate('expenses', expense.created_at)
     db.session.commit()
     
     return jsonify({
@@ -132,19 +134,15 @@ def update_expense(expense_id):
 
 
 @bp.route('/<int:expense_id>', methods=['DELETE'])
-@jwt_required()
+@role_required('owner')
 def delete_expense(expense_id):
     """Delete an expense"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
     expense = Expense.query.get(expense_id)
     if not expense:
         return jsonify({'error': 'Expense not found'}), 404
     
+    ledger.unapply_expense(expense)
+    report_cache.invalidate('expenses', expense.created_at)
     db.session.delete(expense)
     db.session.commit()
     
@@ -166,4 +164,4 @@ def get_categories():
         {'value': 'transport', 'label': 'Transport & Fuel'},
         {'value': 'other', 'label': 'Other Expenses'}
     ]
-    return jsonify({'categories': categories}), 200
\ No newline at end of file
+    return cached_json_response('expense_categories', lambda: {'categories': categories})
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+Bulk exports
+
+Rows are read with yield_per, which uses a server-side cursor on
+PostgreSQL, and written out batch by batch: CSV is streamed to the client as
+it is produced, XLSX goes through openpyxl's write-only mode into a temporary
+file. Memory stays flat whatever the date range.
+"""
+
+import csv
+import io
+import tempfile
+from datetime import datetime, date
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from app import db
+from app.models import Order, OrderItem, Customer, Expense
+from app.security import role_required
+
+bp = Blueprint('exports', __name__, url_prefix='/api/exports')
+
+# Rows fetched from the cursor and written per chunk
+EXPORT_BATCH_SIZE = 2000
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _orders_export():
+    return [
+        ('id', Order.id),
+        ('order_number', Order.order_number),
+        ('created_at', Order.created_at),
+        ('customer', Customer.name),
+        ('customer_phone', Customer.phone),
+        ('total_amount', Order.total_amount),
+        ('discount', Order.discount),
+        ('final_amount', Order.final_amount),
+        ('payment_method', Order.payment_method),
+        ('payment_status', Order.payment_status),
+        ('status', Order.status),
+        ('completed_at', Order.completed_at),
+        ('notes', Order.notes)
+    ], lambda stmt: stmt.outerjoin(Customer, Order.customer_id == Customer.id), Order
+
+
+def _order_items_export():
+    return [
+        ('order_number', Order.order_number),
+        ('created_at', Order.created_at),
+        ('item_type', OrderItem.item_type),
+        ('item_name', OrderItem.item_name),
+        ('quantity', OrderItem.quantity),
+        ('unit_price', OrderItem.unit_price),
+        ('total_price', OrderItem.total_price),
+        ('specifications', OrderItem.specifications)
+    ], lambda stmt: stmt.join(Order, OrderItem.order_id == Order.id), Order
+
+
+def _expenses_export():
+    return [
+        ('id', Expense.id),
+        ('created_at', Expense.created_at),
+        ('category', Expense.category),
+        ('description', Expense.description),
+        ('amount', Expense.amount),
+        ('payment_method', Expense.payment_method),
+        ('receipt_number', Expense.receipt_number)
+    ], lambda stmt: stmt, Expense
+
+
+EXPORTS = {
+    'orders': _orders_export,
+    'order-items': _order_items_export,
+    'expenses': _expenses_export
+}
+
+
+def _export_query(name):
+    """Build (headers, select) for an export, filtered by date_from/date_to"""
+    columns, join, dated = EXPORTS[name]()
+    stmt = join(db.select(*[column for _, column in columns]))
+
+    date_from = request.args.get('date_from')
+    date_to = request.args.get('date_to')
+    if date_from:
+        stmt = stmt.where(dated.created_at >= datetime.fromisoformat(date_from))
+    if date_to:
+        stmt = stmt.where(dated.created_at <= datetime.fromisoformat(date_to))
+    if name == 'expenses' and request.args.get('category'):
+        stmt = stmt.where(Expense.category == request.args['category'])
+
+    order_by = [dated.created_at, dated.id]
+    if name == 'order-items':
+        order_by.append(OrderItem.id)
+
+    return [header for header, _ in columns], stmt.order_by(*order_by)
+
+
+def _rows(stmt):
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for partition in result.partitions():
+        yield from partition
+
+
+# Spreadsheet apps treat cells starting with these as formulas; customer
+# names, notes and descriptions are free text typed by employees
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_stream(headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_value(value) for value in row])
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def _xlsx_value(sheet, value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # An explicit string cell, never parsed as a formula
+        cell = WriteOnlyCell(sheet, value)
+        cell.data_type = 's'
+        return cell
+    return value
+
+
+def _xlsx_file(title, headers, rows):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(headers)
+    for row in rows:
+        sheet.append([_xlsx_value(sheet, value) for value in row])
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def _filename(name, extension):
+    parts = [name] + [request.args[key][:10] for key in ('date_from', 'date_to') if request.args.get(key)]
+    return f"{'_'.join(parts)}.{extension}"
+
+
+@bp.route('/<name>.csv', methods=['GET'])
+@role_required('owner')
+def export_csv(name):
+    """Stream orders, order items or expenses as CSV"""
+    if name not in EXPORTS:
+        return jsonify({'error': 'Unknown export'}), 404
+
+    try:
+        headers, stmt = _export_query(name)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+
+    return Response(
+        stream_with_context(_csv_stream(headers, _rows(stmt))),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{_filename(name, "csv")}"'}
+    )
+
+
+@bp.route('/<name>.xlsx', methods=['GET'])
+@role_required('owner')
+def export_xlsx(name):
+    """Export orders, order items or expenses as an Excel workbook"""
+    if name not in EXPORTS:
+        return jsonify({'error': 'Unknown export'}), 404
+
+    try:
+        headers, stmt = _export_query(name)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+
+    output = _xlsx_file(name, headers, _rows(stmt))
+    return send_file(output, mimetype=XLSX_MIMETYPE, as_attachment=True,
+                     download_name=_filename(name, 'xlsx'))
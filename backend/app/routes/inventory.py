@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from app import db
-from app.models import InventoryItem, User
+from app.models import InventoryItem
+from app.security import role_required
+from app.catalog_cache import cached_json_response
 
 bp = Blueprint('inventory', __name__, url_prefix='/api/inventory')
 
@@ -29,15 +31,10 @@ def get_inventory():
             )
         )
     
-    # Get all items first if we need to filter low stock
     if low_stock:
-        all_items = query.all()
-        low_stock_items = [item for item in all_items if item.is_low_stock]
-        return jsonify({
-            'items': [item.to_dict() for item in low_stock_items],
-            'total': len(low_stock_items)
-        }), 200
+        query = query.filter(InventoryItem.is_low_stock)
     
+    query = query.order_by(InventoryItem.id)
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
@@ -52,8 +49,7 @@ def get_inventory():
 @jwt_required()
 def get_low_stock():
     """Get all low stock items"""
-    items = InventoryItem.query.all()
-    low_stock_items = [item for item in items if item.is_low_stock]
+    low_stock_items = InventoryItem.query.filter(InventoryItem.is_low_stock).order_by(InventoryItem.id).all()
     
     return jsonify({
         'items': [item.to_dict() for item in low_stock_items],
@@ -73,16 +69,9 @@ def get_item(item_id):
 
 
 @bp.route('/', methods=['POST'])
-@jwt_required()
+@role_required('owner')
 def create_item():
     """Create a new inventory item"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    # Only owner can create inventory items
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
     data = request.get_json()
     
     # Validate required fields
@@ -117,16 +106,9 @@ def create_item():
 
 
 @bp.route('/<int:item_id>', methods=['PUT'])
-@jwt_required()
+@role_required('owner')
 def update_item(item_id):
     """Update an inventory item"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    # Only owner can update inventory
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
     item = InventoryItem.query.get(item_id)
     if not item:
         return jsonify({'error': 'Item not found'}), 404
@@ -199,16 +181,9 @@ def adjust_stock(item_id):
 
 
 @bp.route('/<int:item_id>', methods=['DELETE'])
-@jwt_required()
+@role_required('owner')
 def delete_item(item_id):
     """Delete an inventory item"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    # Only owner can delete inventory
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
     item = InventoryItem.query.get(item_id)
     if not item:
         return jsonify({'error': 'Item not found'}), 404
@@ -230,4 +205,4 @@ def get_categories():
         {'value': 'consumables', 'label': 'Consumables'},
         {'value': 'other', 'label': 'Other'}
     ]
-    return jsonify({'categories': categories}), 200
\ No newline at end of file
+    return cached_json_response('inventory_categories', lambda: {'categories': categories})
\ No newline at end of file
@@ -1,17 +1,120 @@
-from flask import Blueprint, request, jsonify
+import io
+import zipfile
+from flask import Blueprint, current_app, request, jsonify, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import json
-from app import db
+from sqlalchemy import func
+from app import db, rollups, receipts
+from app.projections import ORDER_FIELDS, ORDER_SUMMARY, InvalidFields, requested_fields, project, row_dict
+from app.pagination import keyset_paginate, InvalidCursor
+from app.order_numbers import allocate_order_numbers
+from app.stock import product_quantities, reserve_stock, release_stock
 from app.models import Order, OrderItem, Customer, Service, InventoryItem, Transaction, User
 
 bp = Blueprint('orders', __name__, url_prefix='/api/orders')
 
 def generate_order_number():
     """Generate unique order number"""
-    from datetime import datetime
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    return f'ORD-{timestamp}'
+    return allocate_order_numbers(1)[0]
+
+
+def generate_order_numbers(count):
+    """Generate count unique order numbers in one allocation"""
+    return allocate_order_numbers(count)
+
+
+MAX_BATCH_ORDERS = 1000
+MAX_BATCH_RECEIPTS = 1000
+
+
+def parse_created_at(value):
+    """
+    Parse an offline terminal's ISO created_at. Values with an offset (e.g.
+    JavaScript's toISOString() "...Z") become naive UTC like every stored time.
+    """
+    created_at = datetime.fromisoformat(value)
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return created_at
+
+
+def validate_order_data(data, known_customer_ids=None):
+    """Return an error message for an invalid order payload, or None"""
+    if not isinstance(data, dict):
+        return 'Order must be an object'
+    if not isinstance(data.get('items'), list) or len(data['items']) == 0:
+        return 'Order must have at least one item'
+    
+    for item_data in data['items']:
+        if not isinstance(item_data, dict):
+            return 'Each item must be an object'
+        if not all(field in item_data for field in ('item_type', 'item_name', 'unit_price')):
+            return 'Each item requires item_type, item_name and unit_price'
+        if not isinstance(item_data['unit_price'], (int, float)):
+            return 'Item unit_price must be a number'
+        quantity = item_data.get('quantity', 1)
+        if not isinstance(quantity, int) or quantity <= 0:
+            return 'Item quantity must be a positive integer'
+        if item_data.get('item_id') is not None and not isinstance(item_data['item_id'], int):
+            return 'Item item_id must be an integer'
+    
+    discount = data.get('discount')
+    if discount is not None and (isinstance(discount, bool) or not isinstance(discount, (int, float))):
+        return 'Discount must be a number'
+    
+    customer_id = data.get('customer_id')
+    if customer_id is not None and not isinstance(customer_id, int):
+        return 'customer_id must be an integer'
+    if customer_id and known_customer_ids is not None and customer_id not in known_customer_ids:
+        return 'Customer not found'
+    
+    if data.get('created_at'):
+        try:
+            parse_created_at(data['created_at'])
+        except (TypeError, ValueError):
+            return 'Invalid created_at'
+    
+    return None
+
+
+def build_order(data, user_id, order_number):
+    """Build an unsaved Order with its OrderItems from a request payload"""
+    order = Order(
+        order_number=order_number,
+        customer_id=data.get('customer_id'),
+        user_id=user_id,
+        total_amount=0,
+        discount=data.get('discount') or 0,
+        final_amount=0,
+        payment_method=data.get('payment_method', 'cash'),
+        payment_status=data.get('payment_status', 'pending'),
+        status='pending',
+        notes=data.get('notes')
+    )
+    
+    # Offline terminals send the time the sale actually happened
+    if data.get('created_at'):
+        order.created_at = parse_created_at(data['created_at'])
+    
+    total_amount = 0
+    for item_data in data['items']:
+        quantity = item_data.get('quantity', 1)
+        total_price = quantity * item_data['unit_price']
+        order.items.append(OrderItem(
+            item_type=item_data['item_type'],
+            item_id=item_data.get('item_id'),
+            item_name=item_data['item_name'],
+            quantity=quantity,
+            unit_price=item_data['unit_price'],
+            total_price=total_price,
+            specifications=json.dumps(item_data.get('specifications', {}))
+        ))
+        total_amount += total_price
+    
+    order.total_amount = total_amount
+    order.final_amount = total_amount - order.discount
+    return order
 
 
 @bp.route('/', methods=['GET'])
@@ -24,23 +127,50 @@ def get_orders():
     date_to = request.args.get('date_to')
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    cursor = request.args.get('cursor')
     
-    query = Order.query
+    try:
+        fields = requested_fields(request.args, ORDER_FIELDS, ORDER_SUMMARY)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if fields:
+        # Column-only select of the requested fields; the cursor needs created_at and id
+        query = project(Order.query, ORDER_FIELDS, fields, required=['created_at', 'id'])
+        serialize = lambda row: row_dict(row, fields)
+    else:
+        query = Order.query_with_details()
+        serialize = lambda order: order.to_dict()
     
     if status:
-        query = query.filter_by(status=status)
+        query = query.filter(Order.status == status)
     if customer_id:
-        query = query.filter_by(customer_id=customer_id)
+        query = query.filter(Order.customer_id == customer_id)
     if date_from:
         query = query.filter(Order.created_at >= datetime.fromisoformat(date_from))
     if date_to:
         query = query.filter(Order.created_at <= datetime.fromisoformat(date_to))
     
+    # Keyset mode: constant cost per page, total only on request
+    if cursor is not None:
+        try:
+            orders, next_cursor = keyset_paginate(query, Order.created_at, Order.id, cursor, per_page)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        response = {
+            'orders': [serialize(order) for order in orders],
+            'next_cursor': next_cursor
+        }
+        if request.args.get('include_total', 'false').lower() == 'true':
+            response['total'] = query.count()
+        return jsonify(response), 200
+    
     query = query.order_by(Order.created_at.desc())
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
-        'orders': [order.to_dict() for order in pagination.items],
+        'orders': [serialize(order) for order in pagination.items],
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
@@ -66,78 +196,58 @@ def create_order():
     data = request.get_json()
     
     # Validate required fields
-    if not data.get('items') or len(data['items']) == 0:
-        return jsonify({'error': 'Order must have at least one item'}), 400
-    
-    # Create order
-    order = Order(
-        order_number=generate_order_number(),
-        customer_id=data.get('customer_id'),
-        user_id=current_user_id,
-        total_amount=0,
-        discount=data.get('discount', 0),
-        final_amount=0,
-        payment_method=data.get('payment_method', 'cash'),
-        payment_status=data.get('payment_status', 'pending'),
-        status='pending',
-        notes=data.get('notes')
-    )
-    
-    total_amount = 0
-    
-    # Add order items
-    for item_data in data['items']:
-        item_type = item_data['item_type']
-        quantity = item_data.get('quantity', 1)
-        unit_price = item_data['unit_price']
-        total_price = quantity * unit_price
-        
-        order_item = OrderItem(
-            item_type=item_type,
-            item_id=item_data.get('item_id'),
-            item_name=item_data['item_name'],
-            quantity=quantity,
-            unit_price=unit_price,
-            total_price=total_price,
-            specifications=json.dumps(item_data.get('specifications', {}))
-        )
-        
-        order.items.append(order_item)
-        total_amount += total_price
-        
-        # Update inventory if it's a product
-        if item_type == 'product' and item_data.get('item_id'):
-            inventory_item = InventoryItem.query.get(item_data['item_id'])
-            if inventory_item:
-                if inventory_item.quantity < quantity:
-                    return jsonify({'error': f'Insufficient stock for {inventory_item.name}'}), 400
-                inventory_item.quantity -= quantity
-    
-    order.total_amount = total_amount
-    order.final_amount = total_amount - order.discount
-    
-    # Update customer if exists
+    error = validate_order_data(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    # Reserve stock for every product line in one statement
+    short = reserve_stock(product_quantities(data['items']))
+    if short:
+        db.session.rollback()
+        return jsonify({
+            'error': 'Insufficient stock for ' + ', '.join(item.name for item, _ in short),
+            'insufficient_stock': [
+                {
+                    'item_id': item.id,
+                    'name': item.name,
+                    'available': item.quantity,
+                    'requested': requested
+                }
+                for item, requested in short
+            ]
+        }), 400
+    
+    order = build_order(data, current_user_id, generate_order_number())
+    
+    # Update customer if exists (atomic increment, no read-modify-write)
     if order.customer_id:
-        customer = Customer.query.get(order.customer_id)
-        if customer:
-            customer.last_visit = datetime.utcnow()
-            customer.total_spent += order.final_amount
-    
-    db.session.add(order)
-    db.session.commit()
-    
-    # Create transaction if paid
-    if data.get('payment_status') == 'paid':
-        transaction = Transaction(
-            order_id=order.id,
+        updated = db.session.execute(
+            db.update(Customer)
+            .where(Customer.id == order.customer_id)
+            .values(
+                total_spent=func.coalesce(Customer.total_spent, 0) + order.final_amount,
+                last_visit=datetime.utcnow()
+            ),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        if not updated:
+            db.session.rollback()
+            return jsonify({'error': 'Customer not found'}), 404
+    
+    # Create transaction if paid; written in the same flush as the order
+    if order.payment_status == 'paid':
+        order.transactions.append(Transaction(
             transaction_type='sale',
             amount=order.final_amount,
             payment_method=order.payment_method,
             reference_number=data.get('reference_number'),
             user_id=current_user_id
-        )
-        db.session.add(transaction)
-        db.session.commit()
+        ))
+    
+    db.session.add(order)
+    db.session.flush()
+    rollups.apply_order(order)
+    db.session.commit()
     
     return jsonify({
         'message': 'Order created successfully',
@@ -145,16 +255,163 @@ def create_order():
     }), 201
 
 
+@bp.route('/batch', methods=['POST'])
+@jwt_required()
+def create_orders_batch():
+    """
+    Create many orders at once (offline POS replay).
+    
+    Body: {"orders": [<create_order payload, optionally with client_ref and created_at>, ...]}
+    Invalid orders and orders that would oversell stock are rejected
+    individually; everything else is inserted in one transaction.
+    """
+    current_user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    orders_data = data.get('orders')
+    
+    if not isinstance(orders_data, list) or len(orders_data) == 0:
+        return jsonify({'error': 'orders must be a non-empty list'}), 400
+    if len(orders_data) > MAX_BATCH_ORDERS:
+        return jsonify({'error': f'At most {MAX_BATCH_ORDERS} orders per batch'}), 400
+    
+    # Validate everything together: one query for customers, one for stock
+    customer_ids = {
+        d['customer_id'] for d in orders_data
+        if isinstance(d, dict) and isinstance(d.get('customer_id'), int)
+    }
+    known_customer_ids = {
+        row[0] for row in db.session.query(Customer.id).filter(Customer.id.in_(customer_ids))
+    } if customer_ids else set()
+    
+    results = [None] * len(orders_data)
+    valid = []
+    for index, order_data in enumerate(orders_data):
+        error = validate_order_data(order_data, known_customer_ids)
+        if error:
+            results[index] = {'index': index, 'status': 'error', 'error': error}
+        else:
+            valid.append(index)
+    
+    product_ids = {
+        item['item_id']
+        for index in valid
+        for item in orders_data[index]['items']
+        if item['item_type'] == 'product' and item.get('item_id')
+    }
+    stock = {
+        item.id: item
+        for item in InventoryItem.query.filter(InventoryItem.id.in_(product_ids)).with_for_update()
+    } if product_ids else {}
+    remaining = {item_id: item.quantity for item_id, item in stock.items()}
+    
+    # Reserve stock in submission order; an order that would oversell is rejected whole
+    accepted = []
+    for index in valid:
+        needed = {
+            item_id: quantity
+            for item_id, quantity in product_quantities(orders_data[index]['items']).items()
+            if item_id in stock
+        }
+        
+        short = [item_id for item_id, quantity in needed.items() if remaining[item_id] < quantity]
+        if short:
+            names = ', '.join(stock[item_id].name for item_id in short)
+            results[index] = {'index': index, 'status': 'error', 'error': f'Insufficient stock for {names}'}
+            continue
+        
+        for item_id, quantity in needed.items():
+            remaining[item_id] -= quantity
+        accepted.append(index)
+    
+    orders = []
+    created = []
+    if accepted:
+        order_numbers = generate_order_numbers(len(accepted))
+        orders = [
+            build_order(orders_data[index], current_user_id, order_number)
+            for index, order_number in zip(accepted, order_numbers)
+        ]
+        for index, order in zip(accepted, orders):
+            if order.payment_status == 'paid':
+                order.transactions.append(Transaction(
+                    transaction_type='sale',
+                    amount=order.final_amount,
+                    payment_method=order.payment_method,
+                    reference_number=orders_data[index].get('reference_number'),
+                    user_id=current_user_id
+                ))
+        
+        db.session.add_all(orders)
+        db.session.flush()
+        # Read before commit() expires the orders, which would cost a refresh SELECT each
+        created = [(order.id, order.order_number) for order in orders]
+        
+        # Set-based stock decrement: one UPDATE for every product touched
+        deductions = {
+            item_id: stock[item_id].quantity - quantity
+            for item_id, quantity in remaining.items()
+            if quantity != stock[item_id].quantity
+        }
+        if deductions:
+            db.session.execute(
+                db.update(InventoryItem)
+                .where(InventoryItem.id.in_(deductions))
+                .values(quantity=InventoryItem.quantity - db.case(deductions, value=InventoryItem.id, else_=0)),
+                execution_options={'synchronize_session': False}
+            )
+        
+        # Set-based customer update
+        spent = {}
+        for order in orders:
+            if order.customer_id:
+                spent[order.customer_id] = spent.get(order.customer_id, 0) + order.final_amount
+        if spent:
+            db.session.execute(
+                db.update(Customer)
+                .where(Customer.id.in_(spent))
+                .values(
+                    total_spent=func.coalesce(Customer.total_spent, 0) + db.case(spent, value=Customer.id, else_=0),
+                    last_visit=datetime.utcnow()
+                ),
+                execution_options={'synchronize_session': False}
+            )
+        
+        rollups.apply_orders(orders)
+        db.session.commit()
+    
+    for index, (order_id, order_number) in zip(accepted, created):
+        results[index] = {
+            'index': index,
+            'status': 'created',
+            'order_id': order_id,
+            'order_number': order_number
+        }
+    for index, result in enumerate(results):
+        if isinstance(orders_data[index], dict) and orders_data[index].get('client_ref') is not None:
+            result['client_ref'] = orders_data[index]['client_ref']
+    
+    return jsonify({
+        'message': 'Batch processed',
+        'created': len(orders),
+        'failed': len(orders_data) - len(orders),
+        'results': results
+    }), 200
+
+
 @bp.route('/<int:order_id>', methods=['PUT'])
 @jwt_required()
 def update_order(order_id):
     """Update an order"""
-    order = Order.query.get(order_id)
+    # Row lock: the rollup/ledger change below is computed from the order's
+    # current state, so concurrent updates must not both start from it
+    order = db.session.get(Order, order_id, with_for_update=True)
     if not order:
         return jsonify({'error': 'Order not found'}), 404
     
     data = request.get_json()
     
+    rollups.unapply_order(order)
+    
     if 'status' in data:
         order.status = data['status']
         if data['status'] == 'completed':
@@ -167,19 +424,18 @@ def update_order(order_id):
         # Create transaction if payment status changed to paid
         if old_payment_status != 'paid' and data['payment_status'] == 'paid':
             current_user_id = get_jwt_identity()
-            transaction = Transaction(
-                order_id=order.id,
+            order.transactions.append(Transaction(
                 transaction_type='sale',
                 amount=order.final_amount,
                 payment_method=order.payment_method,
                 reference_number=data.get('reference_number'),
                 user_id=current_user_id
-            )
-            db.session.add(transaction)
+            ))
     
     if 'notes' in data:
         order.notes = data['notes']
     
+    rollups.apply_order(order)
     db.session.commit()
     
     return jsonify({
@@ -192,21 +448,26 @@ def update_order(order_id):
 @jwt_required()
 def cancel_order(order_id):
     """Cancel an order"""
-    order = Order.query.get(order_id)
+    # Locked like update_order; a concurrent cancel waits, then sees 'cancelled'
+    order = db.session.get(Order, order_id, with_for_update=True)
     if not order:
         return jsonify({'error': 'Order not found'}), 404
     
     if order.status == 'completed':
         return jsonify({'error': 'Cannot cancel completed order'}), 400
+    if order.status == 'cancelled':
+        return jsonify({'error': 'Order is already cancelled'}), 400
+    
+    rollups.unapply_order(order)
     
     # Restore inventory for product items
-    for item in order.items:
-        if item.item_type == 'product' and item.item_id:
-            inventory_item = InventoryItem.query.get(item.item_id)
-            if inventory_item:
-                inventory_item.quantity += item.quantity
+    release_stock(product_quantities(
+        {'item_type': item.item_type, 'item_id': item.item_id, 'quantity': item.quantity}
+        for item in order.items
+    ))
     
     order.status = 'cancelled'
+    rollups.apply_order(order)
     db.session.commit()
     
     return jsonify({
@@ -219,17 +480,30 @@ def cancel_order(order_id):
 @jwt_required()
 def get_today_orders():
     """Get today's orders"""
-    from datetime import date
-    today = date.today()
-    
-    orders = Order.query.filter(
-        db.func.date(Order.created_at) == today
-    ).order_by(Order.created_at.desc()).all()
+    from datetime import date, timedelta
+    today = datetime.combine(date.today(), datetime.min.time())
+    tomorrow = today + timedelta(days=1)
+    
+    try:
+        fields = requested_fields(request.args, ORDER_FIELDS, ORDER_SUMMARY)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Half-open range instead of func.date() so ix_orders_created_at_id is usable
+    if fields:
+        query = project(Order.query, ORDER_FIELDS, fields, required=['final_amount', 'payment_status', 'created_at'])
+    else:
+        query = Order.query_with_details()
+    query = query.filter(
+        Order.created_at >= today,
+        Order.created_at < tomorrow
+    )
+    orders = query.order_by(Order.created_at.desc()).all()
     
     total_sales = sum(order.final_amount for order in orders if order.payment_status == 'paid')
     
     return jsonify({
-        'orders': [order.to_dict() for order in orders],
+        'orders': [row_dict(order, fields) if fields else order.to_dict() for order in orders],
         'count': len(orders),
         'total_sales': total_sales
     }), 200
@@ -241,32 +515,86 @@ def get_recent_orders():
     """Get recent orders"""
     limit = request.args.get('limit', 10, type=int)
     
-    orders = Order.query.order_by(Order.created_at.desc()).limit(limit).all()
+    try:
+        fields = requested_fields(request.args, ORDER_FIELDS, ORDER_SUMMARY)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if fields:
+        query = project(Order.query, ORDER_FIELDS, fields, required=['id', 'created_at'])
+    else:
+        query = Order.query_with_details()
+    orders = query.order_by(Order.created_at.desc()).limit(limit).all()
     
     return jsonify({
-        'orders': [order.to_dict() for order in orders]
+        'orders': [row_dict(order, fields) if fields else order.to_dict() for order in orders]
     }), 200
 
 
 @bp.route('/<int:order_id>/receipt', methods=['GET'])
 @jwt_required()
 def get_receipt(order_id):
-    """Generate receipt data for an order"""
-    order = Order.query.get(order_id)
+    """Generate receipt data for an order, or the PDF with ?format=pdf"""
+    order = Order.query_with_details().filter(Order.id == order_id).first()
     if not order:
         return jsonify({'error': 'Order not found'}), 404
     
-    from config import Config
-    
-    receipt_data = {
-        'business': {
-            'name': Config.BUSINESS_NAME,
-            'email': Config.BUSINESS_EMAIL,
-            'phone': Config.BUSINESS_PHONE,
-            'address': Config.BUSINESS_ADDRESS
-        },
-        'order': order.to_dict(),
-        'generated_at': datetime.utcnow().isoformat()
-    }
+    receipt_data = receipts.receipt_data(order)
+    
+    if request.args.get('format') == 'pdf':
+        return send_file(
+            io.BytesIO(receipts.render_receipt(receipt_data)),
+            mimetype='application/pdf',
+            download_name=f'{order.order_number}.pdf'
+        )
     
-    return jsonify({'receipt': receipt_data}), 200
\ No newline at end of file
+    return jsonify({'receipt': receipt_data}), 200
+
+
+@bp.route('/receipts', methods=['POST'])
+@jwt_required()
+def get_receipts_batch():
+    """Render PDF receipts for many orders (order_ids, or a date for end-of-day reprints) as a zip"""
+    data = request.get_json() or {}
+    order_ids = data.get('order_ids')
+    day = data.get('date')
+    
+    query = Order.query_with_details()
+    if order_ids is not None:
+        if not isinstance(order_ids, list) or not all(isinstance(order_id, int) for order_id in order_ids):
+            return jsonify({'error': 'order_ids must be a list of ids'}), 400
+        query = query.filter(Order.id.in_(order_ids))
+    elif day:
+        try:
+            start = datetime.fromisoformat(day)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid date format'}), 400
+        start = datetime.combine(start.date(), datetime.min.time())
+        query = query.filter(Order.created_at >= start, Order.created_at < start + timedelta(days=1))
+    else:
+        return jsonify({'error': 'order_ids or date is required'}), 400
+    
+    orders = query.order_by(Order.created_at, Order.id).limit(MAX_BATCH_RECEIPTS + 1).all()
+    if len(orders) > MAX_BATCH_RECEIPTS:
+        return jsonify({'error': f'At most {MAX_BATCH_RECEIPTS} receipts per batch'}), 400
+    if not orders:
+        return jsonify({'error': 'No orders found'}), 404
+    
+    pdfs = receipts.render_receipts(
+        [receipts.receipt_data(order) for order in orders],
+        workers=current_app.config.get('RECEIPT_RENDER_WORKERS')
+    )
+    
+    # PDFs are already compressed; store them as-is
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_STORED) as zf:
+        for order, pdf in zip(orders, pdfs):
+            zf.writestr(f'{order.order_number}.pdf', pdf)
+    archive.seek(0)
+    
+    return send_file(
+        archive,
+        mimetype='application/zip',
+        as_attachment=True,
+        download_name=f"receipts-{day or datetime.utcnow().date().isoformat()}.zip"
+    )
@@ -1,35 +1,39 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, timedelta, date
-from sqlalchemy import func, and_, extract
-from app import db
-from app.models import Order, OrderItem, Transaction, Expense, Customer, Service, InventoryItem, User
+from flask_jwt_extended import jwt_required
+from datetime import datetime, timedelta, date, time
+from sqlalchemy import func, extract
+from sqlalchemy.orm import joinedload
+from app import db, analytics, rollups, ledger, report_cache
+from app.models import Order, OrderItem, Transaction, Expense, Customer, Service, InventoryItem, CustomerRfm
+from app.pagination import keyset_paginate, InvalidCursor
+from app.security import role_required
 
 bp = Blueprint('reports', __name__, url_prefix='/api/reports')
 
+EXPENSE_PERIODS = ('day', 'week', 'month')
+MAX_REPORT_PAGE = 500
+
 @bp.route('/dashboard', methods=['GET'])
 @jwt_required()
 def get_dashboard_stats():
     """Get dashboard statistics"""
     today = date.today()
     
+    today_end = datetime.combine(today, time.max)
+    
     # Today's sales
-    today_orders = Order.query.filter(
-        func.date(Order.created_at) == today,
-        Order.payment_status == 'paid'
-    ).all()
-    today_sales = sum(order.final_amount for order in today_orders)
+    today_orders, today_sales = rollups.paid_sales_totals(
+        datetime.combine(today, time.min), today_end
+    )
     
     # This month's sales
     month_start = today.replace(day=1)
-    month_orders = Order.query.filter(
-        Order.created_at >= month_start,
-        Order.payment_status == 'paid'
-    ).all()
-    month_sales = sum(order.final_amount for order in month_orders)
+    month_orders, month_sales = rollups.paid_sales_totals(
+        datetime.combine(month_start, time.min), today_end
+    )
     
     # Total customers
-    total_customers = Customer.query.count()
+    total_customers = ledger.total_customers()
     
     # New customers this month
     new_customers = Customer.query.filter(
@@ -40,11 +44,10 @@ def get_dashboard_stats():
     pending_orders = Order.query.filter_by(status='pending').count()
     
     # Low stock items
-    all_items = InventoryItem.query.all()
-    low_stock_count = len([item for item in all_items if item.is_low_stock])
+    low_stock_count = InventoryItem.query.filter(InventoryItem.is_low_stock).count()
     
     # Recent orders
-    recent_orders = Order.query.order_by(Order.created_at.desc()).limit(5).all()
+    recent_orders = Order.query_with_details().order_by(Order.created_at.desc()).limit(5).all()
     
     # Top services this month
     top_services_data = db.session.query(
@@ -67,9 +70,9 @@ def get_dashboard_stats():
     
     return jsonify({
         'today_sales': today_sales,
-        'today_orders': len(today_orders),
+        'today_orders': today_orders,
         'month_sales': month_sales,
-        'month_orders': len(month_orders),
+        'month_orders': month_orders,
         'total_customers': total_customers,
         'new_customers': new_customers,
         'pending_orders': pending_orders,
@@ -79,6 +82,70 @@ def get_dashboard_stats():
     }), 200
 
 
+def _sales_rows(start_date, end_date):
+    # One statement: whole days from the daily rollup, partial days from orders
+    return [
+        (day.isoformat(), method, count, sales)
+        for day, method, count, sales in rollups.paid_sales_breakdown(start_date, end_date)
+    ]
+
+
+def _service_rows(start_date, end_date):
+    return [
+        (name, item_type, count, int(quantity or 0), float(revenue or 0))
+        for name, item_type, count, quantity, revenue in db.session.query(
+            OrderItem.item_name,
+            OrderItem.item_type,
+            func.count(OrderItem.id),
+            func.sum(OrderItem.quantity),
+            func.sum(OrderItem.total_price)
+        ).join(Order).filter(
+            Order.created_at >= start_date,
+            Order.created_at <= end_date,
+            Order.payment_status == 'paid',
+            OrderItem.item_type == 'service'
+        ).group_by(OrderItem.item_name, OrderItem.item_type)
+    ]
+
+
+def _expense_category_rows(start_date, end_date):
+    query = db.session.query(
+        Expense.category,
+        func.count(Expense.id),
+        func.sum(Expense.amount)
+    )
+    if start_date and end_date:
+        query = query.filter(Expense.created_at >= start_date, Expense.created_at <= end_date)
+    
+    return [
+        (category, count, float(total or 0))
+        for category, count, total in query.group_by(Expense.category)
+    ]
+
+
+def _expense_period_rows(unit, start_date, end_date):
+    period = ledger.period_start(Expense.created_at, unit)
+    query = db.session.query(
+        period,
+        func.count(Expense.id),
+        func.sum(Expense.amount)
+    )
+    if start_date and end_date:
+        query = query.filter(Expense.created_at >= start_date, Expense.created_at <= end_date)
+    
+    return [
+        (value if isinstance(value, str) else value.isoformat(), count, float(total or 0))
+        for value, count, total in query.group_by(period)
+    ]
+
+
+@bp.route('/cache-stats', methods=['GET'])
+@role_required('owner')
+def get_cache_stats():
+    """Report cache hit/miss/invalidation counters for this worker"""
+    return jsonify({'reports': report_cache.report_cache_stats.snapshot()}), 200
+
+
 @bp.route('/sales', methods=['GET'])
 @jwt_required()
 def get_sales_report():
@@ -95,61 +162,28 @@ def get_sales_report():
     except ValueError:
         return jsonify({'error': 'Invalid date format'}), 400
     
-    # Get orders in date range
-    orders = Order.query.filter(
-        and_(
-            Order.created_at >= start_date,
-            Order.created_at <= end_date,
-            Order.payment_status == 'paid'
-        )
-    ).all()
-    
-    total_sales = sum(order.final_amount for order in orders)
-    total_orders = len(orders)
-    
-    # Group by payment method
-    payment_methods = db.session.query(
-        Order.payment_method,
-        func.count(Order.id).label('count'),
-        func.sum(Order.final_amount).label('total')
-    ).filter(
-        and_(
-            Order.created_at >= start_date,
-            Order.created_at <= end_date,
-            Order.payment_status == 'paid'
-        )
-    ).group_by(Order.payment_method).all()
-    
-    payment_breakdown = [
-        {
-            'method': item[0],
-            'count': item[1],
-            'total': float(item[2] or 0)
-        }
-        for item in payment_methods
-    ]
-    
-    # Daily sales
-    daily_sales = db.session.query(
-        func.date(Order.created_at).label('date'),
-        func.count(Order.id).label('orders'),
-        func.sum(Order.final_amount).label('sales')
-    ).filter(
-        and_(
-            Order.created_at >= start_date,
-            Order.created_at <= end_date,
-            Order.payment_status == 'paid'
-        )
-    ).group_by(func.date(Order.created_at)).order_by(func.date(Order.created_at)).all()
-    
-    daily_breakdown = [
-        {
-            'date': item[0].isoformat(),
-            'orders': item[1],
-            'sales': float(item[2] or 0)
-        }
-        for item in daily_sales
-    ]
+    # Closed days from the report cache, the open tail live
+    sales_rows = report_cache.cached_rows('sales', start_date, end_date, _sales_rows)
+    
+    # Totals, payment and daily breakdowns in a single pass over the rows
+    total_sales = 0.0
+    total_orders = 0
+    payment_data = {}
+    daily_data = {}
+    for day, method, count, sales in sales_rows:
+        total_sales += sales
+        total_orders += count
+        
+        entry = payment_data.setdefault(method, {'method': method, 'count': 0, 'total': 0.0})
+        entry['count'] += count
+        entry['total'] += sales
+        
+        entry = daily_data.setdefault(day, {'date': day, 'orders': 0, 'sales': 0.0})
+        entry['orders'] += count
+        entry['sales'] += sales
+    
+    payment_breakdown = list(payment_data.values())
+    daily_breakdown = [daily_data[day] for day in sorted(daily_data)]
     
     return jsonify({
         'period': {
@@ -171,41 +205,45 @@ def get_services_report():
     date_from = request.args.get('date_from')
     date_to = request.args.get('date_to')
     
-    query = db.session.query(
-        OrderItem.item_name,
-        OrderItem.item_type,
-        func.count(OrderItem.id).label('count'),
-        func.sum(OrderItem.quantity).label('quantity'),
-        func.sum(OrderItem.total_price).label('revenue')
-    ).join(Order)
-    
     if date_from and date_to:
         start_date = datetime.fromisoformat(date_from)
         end_date = datetime.fromisoformat(date_to)
-        query = query.filter(
-            and_(
-                Order.created_at >= start_date,
-                Order.created_at <= end_date,
-                Order.payment_status == 'paid'
-            )
-        )
-    
-    services_data = query.filter(
-        OrderItem.item_type == 'service'
-    ).group_by(OrderItem.item_name, OrderItem.item_type).order_by(
-        func.sum(OrderItem.total_price).desc()
-    ).all()
-    
-    services = [
-        {
-            'name': item[0],
-            'type': item[1],
-            'count': item[2],
-            'quantity': int(item[3]),
-            'revenue': float(item[4])
-        }
-        for item in services_data
-    ]
+        
+        # Closed days from the report cache, the open tail live; merge per service
+        service_data = {}
+        for name, item_type, count, quantity, revenue in report_cache.cached_rows(
+            'services', start_date, end_date, _service_rows
+        ):
+            entry = service_data.setdefault((name, item_type), {
+                'name': name, 'type': item_type, 'count': 0, 'quantity': 0, 'revenue': 0.0
+            })
+            entry['count'] += count
+            entry['quantity'] += quantity
+            entry['revenue'] += revenue
+        services = sorted(service_data.values(), key=lambda s: s['revenue'], reverse=True)
+    else:
+        services_data = db.session.query(
+            OrderItem.item_name,
+            OrderItem.item_type,
+            func.count(OrderItem.id).label('count'),
+            func.sum(OrderItem.quantity).label('quantity'),
+            func.sum(OrderItem.total_price).label('revenue')
+        ).join(Order).filter(
+            OrderItem.item_type == 'service'
+        ).group_by(OrderItem.item_name, OrderItem.item_type).order_by(
+            func.sum(OrderItem.total_price).desc()
+        ).all()
+        
+        services = [
+            {
+                'name': item[0],
+                'type': item[1],
+                'count': item[2],
+                'quantity': int(item[3]),
+                'revenue': float(item[4])
+            }
+            for item in services_data
+        ]
     
     total_revenue = sum(s['revenue'] for s in services)
     
@@ -220,27 +258,32 @@ def get_services_report():
 @jwt_required()
 def get_inventory_report():
     """Get inventory report"""
-    items = InventoryItem.query.all()
-    
-    total_value = sum(item.quantity * item.unit_price for item in items)
-    total_potential = sum(item.quantity * item.selling_price for item in items)
-    low_stock_items = [item for item in items if item.is_low_stock]
+    low_stock_items = InventoryItem.query.filter(InventoryItem.is_low_stock).order_by(InventoryItem.id).all()
     
     # Category breakdown
-    category_data = {}
-    for item in items:
-        if item.category not in category_data:
-            category_data[item.category] = {
-                'items': 0,
-                'quantity': 0,
-                'value': 0
-            }
-        category_data[item.category]['items'] += 1
-        category_data[item.category]['quantity'] += item.quantity
-        category_data[item.category]['value'] += item.quantity * item.unit_price
+    category_rows = db.session.query(
+        InventoryItem.category,
+        func.count(InventoryItem.id),
+        func.coalesce(func.sum(InventoryItem.quantity), 0),
+        func.coalesce(func.sum(InventoryItem.quantity * InventoryItem.unit_price), 0),
+        func.coalesce(func.sum(InventoryItem.quantity * InventoryItem.selling_price), 0)
+    ).group_by(InventoryItem.category).all()
+    
+    category_data = {
+        item[0]: {
+            'items': item[1],
+            'quantity': int(item[2]),
+            'value': float(item[3])
+        }
+        for item in category_rows
+    }
+    
+    total_items = sum(item[1] for item in category_rows)
+    total_value = sum(float(item[3]) for item in category_rows)
+    total_potential = sum(float(item[4]) for item in category_rows)
     
     return jsonify({
-        'total_items': len(items),
+        'total_items': total_items,
         'total_value': total_value,
         'total_potential': total_potential,
         'low_stock_count': len(low_stock_items),
@@ -252,7 +295,18 @@ def get_inventory_report():
 @bp.route('/customers', methods=['GET'])
 @jwt_required()
 def get_customers_report():
-    """Get customers report"""
+    """
+    Get customers report, plus RFM scores from the last `flask compute-rfm` run:
+    per-segment totals and a cursor page of customers by monetary value,
+    optionally filtered with ?segment=
+    """
+    segment = request.args.get('segment')
+    cursor = request.args.get('cursor')
+    per_page = min(request.args.get('per_page', 50, type=int), MAX_REPORT_PAGE)
+    
+    if segment and segment not in analytics.SEGMENTS:
+        return jsonify({'error': f"segment must be one of {', '.join(analytics.SEGMENTS)}"}), 400
+    
     # Top customers by spending
     top_customers = Customer.query.order_by(Customer.total_spent.desc()).limit(10).all()
     
@@ -260,125 +314,167 @@ def get_customers_report():
     recent_customers = Customer.query.order_by(Customer.created_at.desc()).limit(10).all()
     
     # Customers with account balance
-    customers_with_balance = Customer.query.filter(Customer.account_balance > 0).all()
-    total_balance = sum(c.account_balance for c in customers_with_balance)
+    customers_with_balance, total_balance = db.session.query(
+        func.count(Customer.id),
+        func.coalesce(func.sum(Customer.account_balance), 0)
+    ).filter(Customer.account_balance > 0).one()
+    
+    segments = [
+        {'segment': name, 'customers': count, 'monetary': float(monetary or 0)}
+        for name, count, monetary in db.session.query(
+            CustomerRfm.segment,
+            func.count(CustomerRfm.customer_id),
+            func.sum(CustomerRfm.monetary)
+        ).group_by(CustomerRfm.segment).order_by(func.sum(CustomerRfm.monetary).desc())
+    ]
+    
+    query = CustomerRfm.query.options(joinedload(CustomerRfm.customer))
+    if segment:
+        query = query.filter(CustomerRfm.segment == segment)
+    try:
+        scored, next_cursor = keyset_paginate(query, CustomerRfm.monetary, CustomerRfm.customer_id, cursor, per_page)
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    computed_at = db.session.query(func.max(CustomerRfm.computed_at)).scalar()
     
     return jsonify({
-        'total_customers': Customer.query.count(),
+        'total_customers': ledger.total_customers(),
         'top_customers': [c.to_dict() for c in top_customers],
         'recent_customers': [c.to_dict() for c in recent_customers],
-        'customers_with_balance': len(customers_with_balance),
-        'total_customer_balance': total_balance
+        'customers_with_balance': customers_with_balance,
+        'total_customer_balance': float(total_balance),
+        'rfm': {
+            'computed_at': computed_at.isoformat() if computed_at else None,
+            'segments': segments,
+            'customers': [row.to_dict() for row in scored],
+            'next_cursor': next_cursor
+        }
     }), 200
 
 
 @bp.route('/expenses', methods=['GET'])
-@jwt_required()
+@role_required('owner')
 def get_expenses_report():
-    """Get expenses report"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    # Only owner can view expenses
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
+    """
+    Get expenses report: totals and category breakdown computed in SQL, an
+    optional group_by=day|week|month series, and one cursor page of detail
+    rows (the full list streams from /api/exports/expenses.csv)
+    """
     date_from = request.args.get('date_from')
     date_to = request.args.get('date_to')
+    group_by = request.args.get('group_by')
+    cursor = request.args.get('cursor')
+    per_page = min(request.args.get('per_page', 50, type=int), MAX_REPORT_PAGE)
     
-    query = Expense.query
-    
-    if date_from and date_to:
-        start_date = datetime.fromisoformat(date_from)
-        end_date = datetime.fromisoformat(date_to)
-        query = query.filter(
-            and_(
-                Expense.created_at >= start_date,
-                Expense.created_at <= end_date
-            )
-        )
-    
-    expenses = query.all()
-    total_expenses = sum(e.amount for e in expenses)
-    
-    # Category breakdown
-    category_breakdown = db.session.query(
-        Expense.category,
-        func.count(Expense.id).label('count'),
-        func.sum(Expense.amount).label('total')
-    )
+    if group_by and group_by not in EXPENSE_PERIODS:
+        return jsonify({'error': f"group_by must be one of {', '.join(EXPENSE_PERIODS)}"}), 400
     
+    start_date = end_date = None
     if date_from and date_to:
-        category_breakdown = category_breakdown.filter(
-            and_(
-                Expense.created_at >= start_date,
-                Expense.created_at <= end_date
-            )
-        )
+        try:
+            start_date = datetime.fromisoformat(date_from)
+            end_date = datetime.fromisoformat(date_to)
+        except ValueError:
+            return jsonify({'error': 'Invalid date format'}), 400
+    
+    def rows(report, compute):
+        # Closed days from the report cache, the open tail live
+        if start_date:
+            return report_cache.cached_rows(report, start_date, end_date, compute)
+        return compute(None, None)
     
-    category_data = category_breakdown.group_by(Expense.category).all()
+    category_data = {}
+    for category, count, total in rows('expenses', _expense_category_rows):
+        entry = category_data.setdefault(category, {'category': category, 'count': 0, 'total': 0.0})
+        entry['count'] += count
+        entry['total'] += total
+    categories = list(category_data.values())
+    
+    response = {
+        'total_expenses': sum(c['total'] for c in categories),
+        'expenses_count': sum(c['count'] for c in categories),
+        'category_breakdown': categories
+    }
+    
+    if group_by:
+        # A week or month straddling the cache cutoff appears in both parts
+        series = {}
+        for period, count, total in rows(
+            f'expenses_by_{group_by}',
+            lambda start, end: _expense_period_rows(group_by, start, end)
+        ):
+            entry = series.setdefault(period, {'period': period, 'count': 0, 'total': 0.0})
+            entry['count'] += count
+            entry['total'] += total
+        response['group_by'] = group_by
+        response['series'] = [series[period] for period in sorted(series)]
     
-    categories = [
-        {
-            'category': item[0],
-            'count': item[1],
-            'total': float(item[2])
-        }
-        for item in category_data
-    ]
+    query = Expense.query
+    if start_date:
+        query = query.filter(Expense.created_at >= start_date, Expense.created_at <= end_date)
+    try:
+        expenses, next_cursor = keyset_paginate(query, Expense.created_at, Expense.id, cursor, per_page)
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
-    return jsonify({
-        'total_expenses': total_expenses,
-        'expenses_count': len(expenses),
-        'category_breakdown': categories,
-        'expenses': [e.to_dict() for e in expenses]
-    }), 200
+    response['expenses'] = [e.to_dict() for e in expenses]
+    response['next_cursor'] = next_cursor
+    return jsonify(response), 200
 
 
 @bp.route('/profit-loss', methods=['GET'])
-@jwt_required()
+@role_required('owner')
 def get_profit_loss():
-    """Get profit and loss report"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    # Only owner can view P&L
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
+    """Get profit and loss report, optionally with a per-month series (group_by=month)"""
     date_from = request.args.get('date_from')
     date_to = request.args.get('date_to')
+    group_by = request.args.get('group_by')
     
     if not date_from or not date_to:
         return jsonify({'error': 'date_from and date_to are required'}), 400
+    if group_by and group_by != 'month':
+        return jsonify({'error': 'group_by must be month'}), 400
     
-    start_date = datetime.fromisoformat(date_from)
-    end_date = datetime.fromisoformat(date_to)
+    try:
+        start_date = datetime.fromisoformat(date_from)
+        end_date = datetime.fromisoformat(date_to)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
     
-    # Revenue
-    revenue_orders = Order.query.filter(
-        and_(
-            Order.created_at >= start_date,
-            Order.created_at <= end_date,
-            Order.payment_status == 'paid'
-        )
-    ).all()
-    total_revenue = sum(order.final_amount for order in revenue_orders)
-    
-    # Expenses
-    expenses = Expense.query.filter(
-        and_(
-            Expense.created_at >= start_date,
-            Expense.created_at <= end_date
-        )
-    ).all()
-    total_expenses = sum(e.amount for e in expenses)
+    # Whole months from the monthly ledger in one query
+    segments = ledger.month_segments(start_date, end_date)
+    whole_months = [month for month, _, _, whole in segments if whole]
+    ledger_totals = ledger.monthly_totals(whole_months[0], whole_months[-1]) if whole_months else {}
+    
+    series = []
+    for month, segment_start, segment_end, whole in segments:
+        if whole:
+            revenue, expenses = ledger_totals.get(month, (0.0, 0.0))
+        else:
+            # Partial months at either end: closed days from the report cache, the open tail live
+            revenue = sum(
+                row[3] for row in report_cache.cached_rows('sales', segment_start, segment_end, _sales_rows)
+            )
+            expenses = sum(
+                row[2] for row in report_cache.cached_rows('expenses', segment_start, segment_end, _expense_category_rows)
+            )
+        series.append({
+            'period': month.isoformat(),
+            'partial': not whole,
+            'revenue': revenue,
+            'expenses': expenses,
+            'net_profit': revenue - expenses
+        })
+    
+    total_revenue = sum(entry['revenue'] for entry in series)
+    total_expenses = sum(entry['expenses'] for entry in series)
     
     # Net profit
     net_profit = total_revenue - total_expenses
     profit_margin = (net_profit / total_revenue * 100) if total_revenue > 0 else 0
     
-    return jsonify({
+    response = {
         'period': {
             'from': date_from,
             'to': date_to
@@ -387,4 +483,9 @@ def get_profit_loss():
         'expenses': total_expenses,
         'net_profit': net_profit,
         'profit_margin': profit_margin
-    }), 200
\ No newline at end of file
+    }
+    if group_by:
+        response['group_by'] = group_by
+        response['series'] = series
+    
+    return jsonify(response), 200
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from app import db
-from app.models import Service, User
+from app.models import Service
+from app.security import role_required
+from app.catalog_cache import catalog_cache, cached_json_response
 
 bp = Blueprint('services', __name__, url_prefix='/api/services')
 
@@ -12,15 +14,17 @@ def get_services():
     category = request.args.get('category')
     active_only = request.args.get('active_only', 'true').lower() == 'true'
     
-    query = Service.query
-    
-    if category:
-        query = query.filter_by(category=category)
-    if active_only:
-        query = query.filter_by(is_active=True)
-    
-    services = query.all()
-    return jsonify({'services': [service.to_dict() for service in services]}), 200
+    def load():
+        query = Service.query
+        
+        if category:
+            query = query.filter_by(category=category)
+        if active_only:
+            query = query.filter_by(is_active=True)
+        
+        return {'services': [service.to_dict() for service in query.all()]}
+    
+    return cached_json_response(('services', category, active_only), load)
 
 
 @bp.route('/<int:service_id>', methods=['GET'])
@@ -35,16 +39,9 @@ def get_service(service_id):
 
 
 @bp.route('/', methods=['POST'])
-@jwt_required()
+@role_required('owner')
 def create_service():
     """Create a new service"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    # Only owner can create services
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
     data = request.get_json()
     
     # Validate required fields
@@ -63,6 +60,7 @@ def create_service():
     
     db.session.add(service)
     db.session.commit()
+    catalog_cache.bump()
     
     return jsonify({
         'message': 'Service created successfully',
@@ -71,16 +69,9 @@ def create_service():
 
 
 @bp.route('/<int:service_id>', methods=['PUT'])
-@jwt_required()
+@role_required('owner')
 def update_service(service_id):
     """Update a service"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    # Only owner can update services
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
     service = Service.query.get(service_id)
     if not service:
         return jsonify({'error': 'Service not found'}), 404
@@ -101,6 +92,7 @@ def update_service(service_id):
         service.is_active = data['is_active']
     
     db.session.commit()
+    catalog_cache.bump()
     
     return jsonify({
         'message': 'Service updated successfully',
@@ -109,16 +101,9 @@ def update_service(service_id):
 
 
 @bp.route('/<int:service_id>', methods=['DELETE'])
-@jwt_required()
+@role_required('owner')
 def delete_service(service_id):
     """Delete a service"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    # Only owner can delete services
-    if current_user.role != 'owner':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
     service = Service.query.get(service_id)
     if not service:
         return jsonify({'error': 'Service not found'}), 404
@@ -126,6 +111,7 @@ def delete_service(service_id):
     # Soft delete by deactivating
     service.is_active = False
     db.session.commit()
+    catalog_cache.bump()
     
     return jsonify({'message': 'Service deactivated successfully'}), 200
 
@@ -143,4 +129,4 @@ def get_categories():
         {'value': 'general_supplies', 'label': 'General Supplies'},
         {'value': 'other', 'label': 'Other Services'}
     ]
-    return jsonify({'categories': categories}), 200
\ No newline at end of file
+    return cached_json_response('service_categories', lambda: {'categories': categories})
\ No newline at end of file
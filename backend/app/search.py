@@ -0,0 +1,55 @@
+"""
+Customer search backend
+
+On PostgreSQL the name/phone/email columns carry pg_trgm GIN indexes, so
+ILIKE '%q%' and the fuzzy % operator are index scans, and results are
+ranked by trigram similarity. Other databases (SQLite test runs) fall back
+to plain ILIKE with a simple prefix-first ranking.
+
+Phone-prefix matches always rank first: at the counter people type the
+start of a phone number far more often than anything else.
+"""
+
+from sqlalchemy import case, func
+from app import db
+from app.models import Customer
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _columns(include_email):
+    columns = [Customer.name, Customer.phone]
+    if include_email:
+        columns.append(Customer.email)
+    return columns
+
+
+def customer_search_filter(term, include_email=True):
+    """SQL condition matching customers for term (index-backed on PostgreSQL)"""
+    pattern = f'%{_escape_like(term)}%'
+    match = db.or_(*[column.ilike(pattern, escape='\\') for column in _columns(include_email)])
+
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # Typo-tolerant name matches via the pg_trgm similarity operator
+        match = db.or_(match, Customer.name.op('%')(term))
+
+    return match
+
+
+def customer_search_query(term, include_email=True):
+    """Return a Customer query matching term, best matches first"""
+    prefix = f'{_escape_like(term)}%'
+    phone_prefix = case((Customer.phone.like(prefix, escape='\\'), 0), else_=1)
+
+    if db.session.get_bind().dialect.name == 'postgresql':
+        rank = func.greatest(*[
+            func.similarity(func.coalesce(column, ''), term) for column in _columns(include_email)
+        ])
+    else:
+        rank = case((Customer.name.ilike(prefix, escape='\\'), 1), else_=0)
+
+    return Customer.query.filter(
+        customer_search_filter(term, include_email)
+    ).order_by(phone_prefix, rank.desc(), Customer.id)
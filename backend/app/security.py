@@ -0,0 +1,95 @@
+"""
+JWT role claims and revocation
+
+Access and refresh tokens carry the user's role, active flag and
+token_version as claims, so owner-gated routes authorise from the token via
+@role_required('owner') instead of reading the user row on every request.
+
+Revocation stays cheap: each worker keeps an in-memory map of
+user id -> token_version (None for deactivated users), reloaded from the
+small users table every JWT_CLAIMS_CACHE_TTL seconds. Bumping a user's
+token_version (e.g. on deactivation) rejects their existing tokens
+immediately in this worker and within the TTL everywhere else.
+"""
+
+import threading
+import time
+from functools import wraps
+from flask import current_app, jsonify
+from flask_jwt_extended import jwt_required, get_jwt
+from app import db, jwt
+from app.models import User
+
+
+def token_claims(user):
+    """Claims embedded in every token issued for user"""
+    return {
+        'role': user.role,
+        'active': bool(user.is_active),
+        'ver': user.token_version or 0
+    }
+
+
+class TokenVersionCache:
+    """Per-process snapshot of users.token_version for revocation checks"""
+
+    # Minimum seconds between reloads triggered by unknown user ids
+    MISS_RELOAD_INTERVAL = 1.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._loaded_at = None
+
+    def reload(self):
+        rows = db.session.query(User.id, User.token_version, User.is_active).all()
+        with self._lock:
+            self._versions = {
+                user_id: (version or 0) if is_active else None
+                for user_id, version, is_active in rows
+            }
+            self._loaded_at = time.monotonic()
+
+    def get(self, user_id):
+        ttl = current_app.config.get('JWT_CLAIMS_CACHE_TTL', 30)
+        age = time.monotonic() - self._loaded_at if self._loaded_at is not None else None
+
+        if age is None or age > ttl or (user_id not in self._versions and age > self.MISS_RELOAD_INTERVAL):
+            self.reload()
+
+        return self._versions.get(user_id)
+
+    def set(self, user):
+        """Apply a user change to this worker's snapshot right away"""
+        with self._lock:
+            self._versions[user.id] = (user.token_version or 0) if user.is_active else None
+
+
+token_versions = TokenVersionCache()
+
+
+def revoke_user_tokens(user):
+    """Invalidate every token issued to user so far; call token_versions.set(user) after commit"""
+    user.token_version = (user.token_version or 0) + 1
+
+
+@jwt.token_in_blocklist_loader
+def is_token_revoked(jwt_header, jwt_payload):
+    # Tokens issued before role claims existed carry no version: make them log in again
+    if 'ver' not in jwt_payload:
+        return True
+    return token_versions.get(jwt_payload['sub']) != jwt_payload['ver']
+
+
+def role_required(*roles):
+    """jwt_required() that also checks the role claim, e.g. @role_required('owner')"""
+    def decorator(fn):
+        @wraps(fn)
+        @jwt_required()
+        def wrapper(*args, **kwargs):
+            claims = get_jwt()
+            if not claims.get('active') or claims.get('role') not in roles:
+                return jsonify({'error': 'Unauthorized'}), 403
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
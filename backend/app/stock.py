@@ -0,0 +1,66 @@
+"""
+Set-based stock reservation for orders
+
+All product lines of an order are reserved with a single conditional
+UPDATE ... WHERE quantity >= :n RETURNING id, so two cashiers selling the
+last unit cannot both succeed: the row lock taken by the first UPDATE makes
+the second re-check quantity and skip the row.
+"""
+
+from app import db
+from app.models import InventoryItem
+
+
+def product_quantities(items_data):
+    """Sum requested quantities per inventory item over the product lines of an order"""
+    quantities = {}
+    for item_data in items_data:
+        if item_data['item_type'] == 'product' and item_data.get('item_id'):
+            item_id = item_data['item_id']
+            quantities[item_id] = quantities.get(item_id, 0) + item_data.get('quantity', 1)
+    return quantities
+
+
+def reserve_stock(quantities):
+    """
+    Decrement stock for {item_id: quantity} in one statement.
+
+    Returns a list of (InventoryItem, requested) for every line that could not
+    be covered; the caller must roll back when it is non-empty. Unknown item
+    ids are ignored, matching how orders have always treated them.
+    """
+    if not quantities:
+        return []
+
+    needed = db.case(quantities, value=InventoryItem.id)
+    reserved = {
+        row[0] for row in db.session.execute(
+            db.update(InventoryItem)
+            .where(InventoryItem.id.in_(quantities), InventoryItem.quantity >= needed)
+            .values(quantity=InventoryItem.quantity - needed)
+            .returning(InventoryItem.id),
+            execution_options={'synchronize_session': False}
+        )
+    }
+
+    missing = set(quantities) - reserved
+    if not missing:
+        return []
+
+    return [
+        (item, quantities[item.id])
+        for item in InventoryItem.query.filter(InventoryItem.id.in_(missing)).order_by(InventoryItem.id)
+    ]
+
+
+def release_stock(quantities):
+    """Return {item_id: quantity} to stock in one statement"""
+    if not quantities:
+        return
+
+    db.session.execute(
+        db.update(InventoryItem)
+        .where(InventoryItem.id.in_(quantities))
+        .values(quantity=InventoryItem.quantity + db.case(quantities, value=InventoryItem.id)),
+        execution_options={'synchronize_session': False}
+    )
@@ -1,6 +1,38 @@
 import os
 from datetime import timedelta
 
+# Engine/pool settings per deployment profile (DB_PROFILE); DB_POOL_* env vars override
+DB_ENGINE_PROFILES = {
+    'development': {
+        'pool_size': 5,
+        'max_overflow': 5,
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True
+    },
+    'production': {
+        'pool_size': 10,
+        'max_overflow': 10,
+        'pool_timeout': 5,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True
+    }
+}
+
+
+def engine_options(database_uri, profile):
+    """SQLALCHEMY_ENGINE_OPTIONS for profile; SQLite keeps its own pool"""
+    if database_uri.startswith('sqlite'):
+        return {}
+    
+    options = dict(DB_ENGINE_PROFILES[profile])
+    for key, env in (('pool_size', 'DB_POOL_SIZE'), ('max_overflow', 'DB_MAX_OVERFLOW'),
+                     ('pool_timeout', 'DB_POOL_TIMEOUT'), ('pool_recycle', 'DB_POOL_RECYCLE')):
+        if os.environ.get(env):
+            options[key] = int(os.environ[env])
+    return options
+
+
 class Config:
     # Flask
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'kocho-dev-secret-key'
@@ -11,11 +43,48 @@ class Config:
         "postgresql://postgres:123456@db:5432/kocho_db"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_PROFILE = os.environ.get('DB_PROFILE', 'production')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI, DB_PROFILE)
+    
+    # Per-blueprint PostgreSQL statement_timeout in milliseconds
+    STATEMENT_TIMEOUTS_MS = {
+        'default': int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 15000)),
+        'orders': int(os.environ.get('DB_POS_STATEMENT_TIMEOUT_MS', 5000)),
+        'customers': int(os.environ.get('DB_POS_STATEMENT_TIMEOUT_MS', 5000)),
+        'reports': int(os.environ.get('DB_REPORTS_STATEMENT_TIMEOUT_MS', 60000)),
+        'exports': int(os.environ.get('DB_REPORTS_STATEMENT_TIMEOUT_MS', 60000))
+    }
     
     # JWT
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'kocho-jwt-dev-secret'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=8)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    JWT_CLAIMS_CACHE_TTL = int(os.environ.get('JWT_CLAIMS_CACHE_TTL', 30))  # seconds
+    CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 60))  # seconds, cross-worker staleness bound
+    CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get('CATALOG_CACHE_MAX_ENTRIES', 256))
+    
+    # Response encoding: JSON provider ('orjson' or Flask's 'default') and
+    # gzip/brotli compression for bodies of at least COMPRESS_MIN_SIZE bytes
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'orjson')
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+    BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+    
+    # /api/metrics: METRICS_DIR shares counters between gunicorn workers,
+    # METRICS_TOKEN (if set) is required as a Bearer token to scrape
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))  # seconds
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Password hashing: scrypt:<n>:<r>:<p>, pbkdf2:<hash>:<iterations> or bcrypt:<rounds>
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+    PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 32))  # waiting behind the workers
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))  # seconds
+    
+    # Processes used by POST /api/orders/receipts for large batches
+    RECEIPT_RENDER_WORKERS = int(os.environ.get('RECEIPT_RENDER_WORKERS', os.cpu_count() or 1))
     
     # Business Info
     BUSINESS_NAME = "Kocho Printers and Cyber Ltd"
@@ -0,0 +1,26 @@
+"""Add users.token_version for JWT revocation
+
+Revision ID: 1b7e9d4c2a60
+Revises: f3d6b8a1c5e9
+Create Date: 2026-10-16 14:18:36.405127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b7e9d4c2a60'
+down_revision = 'f3d6b8a1c5e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('token_version')
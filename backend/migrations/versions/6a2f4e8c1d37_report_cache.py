@@ -0,0 +1,40 @@
+"""Add report_cache and report_cache_epochs
+
+Revision ID: 6a2f4e8c1d37
+Revises: 1b7e9d4c2a60
+Create Date: 2026-10-16 16:02:11.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a2f4e8c1d37'
+down_revision = '1b7e9d4c2a60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('report_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('report', sa.String(length=30), nullable=False),
+    sa.Column('range_start', sa.DateTime(), nullable=False),
+    sa.Column('range_end', sa.DateTime(), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('report', 'range_start', 'range_end', name='uq_report_cache_key')
+    )
+    epochs = op.create_table('report_cache_epochs',
+    sa.Column('source', sa.String(length=20), nullable=False),
+    sa.Column('epoch', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('source')
+    )
+    op.bulk_insert(epochs, [{'source': 'orders', 'epoch': 0}, {'source': 'expenses', 'epoch': 0}])
+
+
+def downgrade():
+    op.drop_table('report_cache_epochs')
+    op.drop_table('report_cache')
@@ -0,0 +1,50 @@
+"""Add daily_sales_rollup
+
+Revision ID: 7c1e4a2b9d10
+Revises: 3d95aae9360e
+Create Date: 2026-10-16 09:12:41.308214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e4a2b9d10'
+down_revision = '3d95aae9360e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_sales_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sale_date', sa.Date(), nullable=False),
+    sa.Column('payment_method', sa.String(length=20), nullable=False),
+    sa.Column('payment_status', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('total_sales', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('sale_date', 'payment_method', 'payment_status', 'status', name='uq_daily_sales_rollup_key')
+    )
+
+    # Backfill from existing orders (same aggregate as `flask rebuild-rollups`)
+    op.execute("""
+        INSERT INTO daily_sales_rollup
+            (sale_date, payment_method, payment_status, status, order_count, total_sales)
+        SELECT DATE(created_at),
+               payment_method,
+               COALESCE(payment_status, 'pending'),
+               COALESCE(status, 'pending'),
+               COUNT(id),
+               COALESCE(SUM(final_amount), 0)
+        FROM orders
+        WHERE created_at IS NOT NULL
+        GROUP BY DATE(created_at), payment_method,
+                 COALESCE(payment_status, 'pending'), COALESCE(status, 'pending')
+    """)
+
+
+def downgrade():
+    op.drop_table('daily_sales_rollup')
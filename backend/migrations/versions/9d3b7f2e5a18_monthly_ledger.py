@@ -0,0 +1,64 @@
+"""Add monthly_ledger
+
+Revision ID: 9d3b7f2e5a18
+Revises: 6a2f4e8c1d37
+Create Date: 2026-10-16 17:24:48.107395
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3b7f2e5a18'
+down_revision = '6a2f4e8c1d37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('monthly_ledger',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('paid_orders', sa.Integer(), nullable=False),
+    sa.Column('expenses', sa.Float(), nullable=False),
+    sa.Column('expense_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('month', name='uq_monthly_ledger_month')
+    )
+
+    # Backfill from existing orders and expenses (same totals as `flask rebuild-ledger`)
+    if op.get_bind().dialect.name == 'postgresql':
+        month = "DATE(DATE_TRUNC('month', created_at))"
+    else:
+        month = "STRFTIME('%Y-%m-01', created_at)"
+
+    op.execute(f"""
+        INSERT INTO monthly_ledger (month, revenue, paid_orders, expenses, expense_count)
+        SELECT month, SUM(revenue), SUM(paid_orders), SUM(expenses), SUM(expense_count)
+        FROM (
+            SELECT {month} AS month,
+                   COALESCE(SUM(final_amount), 0) AS revenue,
+                   COUNT(id) AS paid_orders,
+                   0 AS expenses,
+                   0 AS expense_count
+            FROM orders
+            WHERE created_at IS NOT NULL AND payment_status = 'paid'
+            GROUP BY {month}
+            UNION ALL
+            SELECT {month},
+                   0,
+                   0,
+                   COALESCE(SUM(amount), 0),
+                   COUNT(id)
+            FROM expenses
+            WHERE created_at IS NOT NULL
+            GROUP BY {month}
+        ) AS months
+        GROUP BY month
+    """)
+
+
+def downgrade():
+    op.drop_table('monthly_ledger')
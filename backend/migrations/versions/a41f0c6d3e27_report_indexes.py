@@ -0,0 +1,63 @@
+"""Add secondary indexes for report and listing access paths
+
+Revision ID: a41f0c6d3e27
+Revises: 7c1e4a2b9d10
+Create Date: 2026-10-16 10:04:17.552930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41f0c6d3e27'
+down_revision = '7c1e4a2b9d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # orders: date-range reports, paid-only revenue, status counts, customer history
+    op.create_index('ix_orders_created_at_id', 'orders', ['created_at', 'id'], unique=False)
+    op.create_index('ix_orders_paid_created_at', 'orders', ['created_at'], unique=False,
+                    postgresql_where=sa.text("payment_status = 'paid'"))
+    op.create_index('ix_orders_status_created_at', 'orders', ['status', 'created_at'], unique=False)
+    op.create_index('ix_orders_customer_id_created_at', 'orders', ['customer_id', 'created_at'], unique=False)
+
+    # order_items: joins back to orders and the service-only reports
+    op.create_index('ix_order_items_order_id', 'order_items', ['order_id'], unique=False)
+    op.create_index('ix_order_items_item_type_order_id', 'order_items', ['item_type', 'order_id'], unique=False)
+
+    op.create_index('ix_transactions_order_id', 'transactions', ['order_id'], unique=False)
+
+    # expenses: date-range reports and category filters
+    op.create_index('ix_expenses_created_at_id', 'expenses', ['created_at', 'id'], unique=False)
+    op.create_index('ix_expenses_category_created_at', 'expenses', ['category', 'created_at'], unique=False)
+
+    # customers: listing order, new-customer counts, top spenders, open balances
+    if op.get_bind().dialect.name == 'postgresql':
+        # Matches the listing's ORDER BY last_visit DESC NULLS LAST, id DESC
+        op.create_index('ix_customers_last_visit_id', 'customers',
+                        [sa.text('last_visit DESC NULLS LAST'), sa.text('id DESC')], unique=False)
+    else:
+        op.create_index('ix_customers_last_visit_id', 'customers', ['last_visit', 'id'], unique=False)
+    op.create_index('ix_customers_created_at', 'customers', ['created_at'], unique=False)
+    op.create_index('ix_customers_total_spent', 'customers', ['total_spent'], unique=False)
+    op.create_index('ix_customers_with_balance', 'customers', ['account_balance'], unique=False,
+                    postgresql_where=sa.text('account_balance > 0'))
+
+
+def downgrade():
+    op.drop_index('ix_customers_with_balance', table_name='customers')
+    op.drop_index('ix_customers_total_spent', table_name='customers')
+    op.drop_index('ix_customers_created_at', table_name='customers')
+    op.drop_index('ix_customers_last_visit_id', table_name='customers')
+    op.drop_index('ix_expenses_category_created_at', table_name='expenses')
+    op.drop_index('ix_expenses_created_at_id', table_name='expenses')
+    op.drop_index('ix_transactions_order_id', table_name='transactions')
+    op.drop_index('ix_order_items_item_type_order_id', table_name='order_items')
+    op.drop_index('ix_order_items_order_id', table_name='order_items')
+    op.drop_index('ix_orders_customer_id_created_at', table_name='orders')
+    op.drop_index('ix_orders_status_created_at', table_name='orders')
+    op.drop_index('ix_orders_paid_created_at', table_name='orders')
+    op.drop_index('ix_orders_created_at_id', table_name='orders')
@@ -0,0 +1,41 @@
+"""Add customer_rfm
+
+Revision ID: b4e8a2d6f019
+Revises: 9d3b7f2e5a18
+Create Date: 2026-10-16 18:10:37.264511
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e8a2d6f019'
+down_revision = '9d3b7f2e5a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('customer_rfm',
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('last_order_at', sa.DateTime(), nullable=True),
+    sa.Column('recency_days', sa.Integer(), nullable=True),
+    sa.Column('frequency', sa.Integer(), nullable=False),
+    sa.Column('monetary', sa.Float(), nullable=False),
+    sa.Column('r_score', sa.SmallInteger(), nullable=False),
+    sa.Column('f_score', sa.SmallInteger(), nullable=False),
+    sa.Column('m_score', sa.SmallInteger(), nullable=False),
+    sa.Column('segment', sa.String(length=30), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('customer_id')
+    )
+    op.create_index('ix_customer_rfm_monetary', 'customer_rfm', ['monetary', 'customer_id'], unique=False)
+    op.create_index('ix_customer_rfm_segment_monetary', 'customer_rfm', ['segment', 'monetary', 'customer_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_customer_rfm_segment_monetary', table_name='customer_rfm')
+    op.drop_index('ix_customer_rfm_monetary', table_name='customer_rfm')
+    op.drop_table('customer_rfm')
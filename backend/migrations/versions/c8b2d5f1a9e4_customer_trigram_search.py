@@ -0,0 +1,34 @@
+"""Add pg_trgm indexes for customer search
+
+Revision ID: c8b2d5f1a9e4
+Revises: a41f0c6d3e27
+Create Date: 2026-10-16 11:21:09.874412
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8b2d5f1a9e4'
+down_revision = 'a41f0c6d3e27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # GIN/gin_trgm_ops on PostgreSQL; plain indexes elsewhere
+    op.create_index('ix_customers_name_trgm', 'customers', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_customers_phone_trgm', 'customers', ['phone'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'phone': 'gin_trgm_ops'})
+    op.create_index('ix_customers_email_trgm', 'customers', ['email'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_customers_email_trgm', table_name='customers')
+    op.drop_index('ix_customers_phone_trgm', table_name='customers')
+    op.drop_index('ix_customers_name_trgm', table_name='customers')
@@ -0,0 +1,41 @@
+"""Add new_customers to monthly_ledger
+
+Revision ID: d2f7a9c4e1b8
+Revises: b4e8a2d6f019
+Create Date: 2026-10-17 09:42:18.306251
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f7a9c4e1b8'
+down_revision = 'b4e8a2d6f019'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('monthly_ledger', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('new_customers', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from existing customers (same counts as `flask rebuild-ledger`)
+    if op.get_bind().dialect.name == 'postgresql':
+        month = "DATE(DATE_TRUNC('month', created_at))"
+    else:
+        month = "STRFTIME('%Y-%m-01', created_at)"
+
+    op.execute(f"""
+        INSERT INTO monthly_ledger (month, revenue, paid_orders, expenses, expense_count, new_customers)
+        SELECT {month}, 0, 0, 0, 0, COUNT(id)
+        FROM customers
+        WHERE created_at IS NOT NULL
+        GROUP BY {month}
+        ON CONFLICT (month) DO UPDATE SET new_customers = excluded.new_customers
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('monthly_ledger', schema=None) as batch_op:
+        batch_op.drop_column('new_customers')
@@ -0,0 +1,25 @@
+"""Add partial index for low-stock inventory items
+
+Revision ID: e5a9c3b7d2f6
+Revises: c8b2d5f1a9e4
+Create Date: 2026-10-16 12:02:55.120367
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9c3b7d2f6'
+down_revision = 'c8b2d5f1a9e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_inventory_items_low_stock', 'inventory_items', ['id'], unique=False,
+                    postgresql_where=sa.text('quantity <= min_quantity'))
+
+
+def downgrade():
+    op.drop_index('ix_inventory_items_low_stock', table_name='inventory_items')
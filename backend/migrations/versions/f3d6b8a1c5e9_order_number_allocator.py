@@ -0,0 +1,35 @@
+"""Add order number sequence and counter
+
+Revision ID: f3d6b8a1c5e9
+Revises: e5a9c3b7d2f6
+Create Date: 2026-10-16 13:40:22.691053
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3d6b8a1c5e9'
+down_revision = 'e5a9c3b7d2f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Must match ORDER_NUMBER_BLOCK_SIZE in app/models.py
+    if op.get_bind().dialect.supports_sequences:
+        op.execute(sa.schema.CreateSequence(sa.Sequence('order_number_seq', start=1, increment=100)))
+
+    counter = op.create_table('order_number_counter',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('next_value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(counter, [{'id': 1, 'next_value': 1}])
+
+
+def downgrade():
+    op.drop_table('order_number_counter')
+    if op.get_bind().dialect.supports_sequences:
+        op.execute(sa.schema.DropSequence(sa.Sequence('order_number_seq')))
@@ -0,0 +1,75 @@
+"""
+Exports stream in flat memory (user-016)
+
+Bulk-inserts a million expenses, then streams /api/exports/expenses.csv and
+samples the process RSS while the body is consumed. The peak growth over
+the RSS measured just before the request must stay under RSS_CEILING_MB, far
+below what holding the rows or the CSV in memory would take.
+"""
+
+import gc
+import os
+import time
+import pytest
+from app import db
+from app.models import User
+
+ROWS = 1000000
+RSS_CEILING_MB = 64
+
+
+def _rss():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _seed(user_id):
+    columns = 'category, description, amount, payment_method, receipt_number, user_id, created_at'
+    if db.engine.dialect.name == 'postgresql':
+        statement = f"""
+            INSERT INTO expenses ({columns})
+            SELECT (ARRAY['rent', 'utilities', 'supplies', 'salary'])[1 + n % 4],
+                   'Expense ' || n || ': paper, toner and courier',
+                   n % 5000 + 0.5, 'cash', 'R' || n, :user_id,
+                   TIMESTAMP '2025-01-01' + n * INTERVAL '30 seconds'
+            FROM generate_series(1, :rows) AS n
+        """
+    else:
+        statement = f"""
+            WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < :rows)
+            INSERT INTO expenses ({columns})
+            SELECT CASE n % 4 WHEN 0 THEN 'rent' WHEN 1 THEN 'utilities' WHEN 2 THEN 'supplies' ELSE 'salary' END,
+                   'Expense ' || n || ': paper, toner and courier',
+                   n % 5000 + 0.5, 'cash', 'R' || n, :user_id,
+                   datetime('2025-01-01', '+' || (n * 30) || ' seconds')
+            FROM seq
+        """
+    db.session.execute(db.text(statement), {'rows': ROWS, 'user_id': user_id})
+    db.session.commit()
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/statm'), reason='needs /proc to sample RSS')
+def test_csv_export_memory_is_flat(app, client, auth_headers):
+    _seed(User.query.filter_by(username='owner').one().id)
+    db.session.remove()
+    gc.collect()
+
+    baseline = peak = _rss()
+    began = time.perf_counter()
+    response = client.get('/api/exports/expenses.csv', headers=auth_headers, buffered=False)
+    assert response.status_code == 200
+
+    lines = size = 0
+    for chunk in response.iter_encoded():
+        lines += chunk.count(b'\n')
+        size += len(chunk)
+        peak = max(peak, _rss())
+    response.close()
+    elapsed = time.perf_counter() - began
+
+    growth_mb = (peak - baseline) / 2 ** 20
+    print(f'\nexported {ROWS} rows ({size / 2 ** 20:.0f} MB) in {elapsed:.1f}s, '
+          f'peak RSS growth {growth_mb:.1f} MB')
+
+    assert lines == ROWS + 1
+    assert growth_mb < RSS_CEILING_MB
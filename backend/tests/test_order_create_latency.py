@@ -0,0 +1,54 @@
+"""
+Order creation is one commit (user-010)
+
+Creates paid orders for a customer, with a stocked product and a service
+line, through POST /api/orders/. Each order, its customer totals and its sale
+transaction must reach the database in a single commit. Prints the
+write-path latency.
+"""
+
+import time
+from sqlalchemy import event
+from app import db
+from app.models import Customer, InventoryItem, Order, Transaction
+
+ORDERS = 200
+
+
+def test_create_order_commits_once(app, client, auth_headers):
+    customer = Customer(name='Walk-in', phone='0700000000')
+    paper = InventoryItem(name='A4 ream', category='stationery', sku='A4', quantity=ORDERS + 10,
+                          min_quantity=5, unit_price=400, selling_price=550)
+    db.session.add_all([customer, paper])
+    db.session.commit()
+
+    order = {'customer_id': customer.id, 'payment_method': 'cash', 'payment_status': 'paid', 'items': [
+        {'item_type': 'product', 'item_id': paper.id, 'item_name': 'A4 ream', 'quantity': 1, 'unit_price': 550},
+        {'item_type': 'service', 'item_name': 'Print', 'quantity': 5, 'unit_price': 5}
+    ]}
+    assert client.post('/api/orders/', headers=auth_headers, json=order).status_code == 201
+
+    commits = []
+
+    def record(conn):
+        commits.append(conn)
+
+    event.listen(db.engine, 'commit', record)
+    timings = []
+    try:
+        for _ in range(ORDERS):
+            began = time.perf_counter()
+            response = client.post('/api/orders/', headers=auth_headers, json=order)
+            timings.append((time.perf_counter() - began) * 1000)
+            assert response.status_code == 201, response.get_json()
+    finally:
+        event.remove(db.engine, 'commit', record)
+
+    timings.sort()
+    print(f'\n{ORDERS} paid orders: p50 {timings[ORDERS // 2]:.2f} ms, '
+          f'p95 {timings[int(ORDERS * 0.95)]:.2f} ms, {len(commits) / ORDERS:.1f} commits/order')
+
+    assert len(commits) == ORDERS
+    assert Transaction.query.filter_by(transaction_type='sale').count() == Order.query.count() == ORDERS + 1
+    db.session.expire_all()
+    assert db.session.get(Customer, customer.id).total_spent == (ORDERS + 1) * 575
@@ -0,0 +1,125 @@
+"""
+Order numbers never collide across threads and forked workers (user-009)
+
+test_allocator_blocks_across_fork drives OrderNumberAllocator against a
+shared counter standing in for order_number_seq, in a parent that already
+holds a block when it forks, as the preloaded gunicorn master does.
+
+test_concurrent_order_creation creates thousands of orders through the API
+from forked worker processes at once and checks that every stored
+order_number is unique. It uses order_number_seq on PostgreSQL and
+order_number_counter on SQLite.
+"""
+
+import multiprocessing
+import threading
+import time
+from app import db
+from app.models import Order
+from app.order_numbers import OrderNumberAllocator
+
+WORKERS = 4
+THREADS = 4
+
+
+class SharedSequenceAllocator(OrderNumberAllocator):
+    """Allocator whose blocks come from a counter shared between processes"""
+
+    def __init__(self, sequence, block_size):
+        super().__init__(block_size)
+        self.sequence = sequence
+
+    def _next_block(self):
+        with self.sequence.get_lock():
+            value = self.sequence.value
+            self.sequence.value += self.block_size
+        return value
+
+
+def _allocate_in_threads(allocator, calls, count):
+    values = []
+    lock = threading.Lock()
+
+    def run():
+        for _ in range(calls):
+            allocated = allocator.allocate(count)
+            with lock:
+                values.extend(allocated)
+
+    threads = [threading.Thread(target=run) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return values
+
+
+def _allocator_worker(allocator, results):
+    results.put(_allocate_in_threads(allocator, calls=200, count=3))
+
+
+def test_allocator_blocks_across_fork():
+    context = multiprocessing.get_context('fork')
+    allocator = SharedSequenceAllocator(context.Value('q', 1), block_size=50)
+
+    # The parent holds a partly used block when the workers fork
+    parent_values = allocator.allocate(7)
+
+    results = context.Queue()
+    workers = [context.Process(target=_allocator_worker, args=(allocator, results)) for _ in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    values = [value for _ in workers for value in results.get(timeout=60)]
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    values += parent_values + allocator.allocate(7)
+    assert len(values) == WORKERS * THREADS * 200 * 3 + 14
+    assert len(set(values)) == len(values)
+
+
+def _order_worker(app, headers, batches, batch_size, results):
+    # Like gunicorn's post_fork: never reuse the parent's connections
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    client = app.test_client()
+    order = {'payment_method': 'cash', 'payment_status': 'paid', 'items': [
+        {'item_type': 'service', 'item_name': 'Print', 'quantity': 1, 'unit_price': 10}
+    ]}
+    statuses = []
+    for _ in range(batches):
+        response = client.post('/api/orders/batch', headers=headers, json={'orders': [order] * batch_size})
+        statuses.append((response.status_code, response.get_json().get('created')))
+    results.put(statuses)
+
+
+def test_concurrent_order_creation(app, auth_headers):
+    batches, batch_size = 5, 200
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+
+    # Connections opened by the fixtures must not leak into the children
+    db.session.remove()
+    db.engine.dispose()
+
+    workers = [
+        context.Process(target=_order_worker, args=(app, auth_headers, batches, batch_size, results))
+        for _ in range(WORKERS)
+    ]
+    began = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    statuses = [status for _ in workers for status in results.get(timeout=120)]
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - began
+
+    total = WORKERS * batches * batch_size
+    print(f'\n{total} orders from {WORKERS} processes in {elapsed:.2f}s ({total / elapsed:.0f}/s)')
+
+    assert statuses == [(200, batch_size)] * (WORKERS * batches)
+    numbers = [number for (number,) in db.session.query(Order.order_number)]
+    assert len(numbers) == total
+    assert len(set(numbers)) == total
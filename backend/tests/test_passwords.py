@@ -0,0 +1,118 @@
+"""
+Password hashing throughput and back-pressure (user-012)
+
+test_login_throughput logs in through /api/auth/login for each hash setting
+and prints logins per second per core. Concurrent logins run on
+PASSWORD_HASH_WORKERS threads, one per core.
+
+test_hash_queue_is_bounded fills the pool and its queue, then checks that
+the next hash is refused straight away and that a slow one times out.
+"""
+
+import os
+import threading
+import time
+import pytest
+from app import db, passwords
+from app.models import User
+from app.passwords import PasswordHasherBusy
+
+SETTINGS = [
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+    'pbkdf2:sha256:310000',
+    'pbkdf2:sha256:600000',
+    'bcrypt:10',
+    'bcrypt:12'
+]
+LOGINS = 12
+
+
+def _cores():
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
+
+@pytest.fixture
+def fresh_pool(monkeypatch):
+    """A hashing pool built from the test's config rather than reused from earlier tests"""
+    for name in ('_executor', '_executor_pid', '_slots'):
+        monkeypatch.setattr(passwords, name, None)
+
+
+def test_login_throughput(app, fresh_pool):
+    cores = _cores()
+    app.config['PASSWORD_HASH_WORKERS'] = cores
+    owner = User.query.filter_by(username='owner').one()
+    results = []
+
+    for method in SETTINGS:
+        app.config['PASSWORD_HASH_METHOD'] = method
+        owner.set_password('password')
+        db.session.commit()
+
+        failures = []
+        clients = cores * 2
+
+        def log_in(count):
+            client = app.test_client()
+            for _ in range(count):
+                response = client.post('/api/auth/login', json={'username': 'owner', 'password': 'password'})
+                if response.status_code != 200:
+                    failures.append(response.status_code)
+
+        threads = [threading.Thread(target=log_in, args=(LOGINS // clients + (i < LOGINS % clients),))
+                   for i in range(clients)]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        assert not failures, (method, failures)
+        assert User.query.filter_by(username='owner').one().password_hash == owner.password_hash
+        results.append((method, LOGINS / elapsed / cores))
+
+    print(f'\nlogins/s per core ({cores} core{"s" if cores > 1 else ""}):')
+    for method, rate in results:
+        print(f'  {method:22} {rate:6.1f}')
+
+
+def test_hash_queue_is_bounded(app, fresh_pool):
+    app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_SIZE=1, PASSWORD_HASH_TIMEOUT=0.2)
+    release = threading.Event()
+    timeouts = []
+
+    def wait_for_release():
+        with app.app_context():
+            try:
+                passwords._run(release.wait)
+            except PasswordHasherBusy as e:
+                timeouts.append(str(e))
+
+    # One running and one queued hash fill the pool
+    waiting = [threading.Thread(target=wait_for_release) for _ in range(2)]
+    for thread in waiting:
+        thread.start()
+    time.sleep(0.05)
+
+    began = time.perf_counter()
+    with pytest.raises(PasswordHasherBusy, match='queue is full'):
+        passwords.hash_password('password')
+    assert time.perf_counter() - began < 0.1
+
+    for thread in waiting:
+        thread.join()
+    assert timeouts == ['Timed out waiting for password hashing'] * 2
+    release.set()
+
+    # The slots come back once the running hash finishes; the queued one was dropped
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            assert passwords.verify_password(passwords.hash_password('password'), 'password')
+            break
+        except PasswordHasherBusy:
+            time.sleep(0.05)
+    else:
+        pytest.fail('hashing pool never drained')
@@ -0,0 +1,86 @@
+"""
+Order listings run a constant number of SQL statements (user-003)
+
+Each endpoint is measured with few and with many orders on the page; the
+eager-loading helper (Order.query_with_details) must keep the statement
+count the same, i.e. no per-order queries for the customer or items.
+Batch order creation is held to the same rule for everything but the row
+INSERTs themselves.
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.models import Customer, Order, OrderItem
+
+
+def _add_orders(count, customer_id=None):
+    now = datetime.utcnow()
+    start = Order.query.count()
+    for i in range(start, start + count):
+        order = Order(
+            order_number=f'ORD-T-{i:06d}', customer_id=customer_id or (i % 3) + 1, user_id=1,
+            total_amount=30, discount=0, final_amount=30, payment_method='cash',
+            payment_status='paid', status='completed', created_at=now - timedelta(seconds=i)
+        )
+        order.items = [
+            OrderItem(item_type='service', item_name='Print', quantity=1, unit_price=10, total_price=10)
+            for _ in range(3)
+        ]
+        db.session.add(order)
+    db.session.commit()
+
+
+def _statement_count(client, url, headers, statements):
+    # Warm-up request so per-process caches (token versions, catalog) do not skew the count
+    assert client.get(url, headers=headers).status_code == 200
+    del statements[:]
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return len(statements)
+
+
+@pytest.mark.parametrize('small_url, large_url', [
+    ('/api/orders/?per_page=3', '/api/orders/?per_page=40'),
+    ('/api/orders/?cursor=&per_page=3', '/api/orders/?cursor=&per_page=40'),
+    ('/api/orders/recent?limit=3', '/api/orders/recent?limit=40'),
+])
+def test_order_lists_constant_by_page_size(app, client, auth_headers, statements, small_url, large_url):
+    db.session.add_all([Customer(name=f'Customer {i}', phone=f'07000000{i}') for i in range(1, 4)])
+    _add_orders(50)
+
+    small = _statement_count(client, small_url, auth_headers, statements)
+    large = _statement_count(client, large_url, auth_headers, statements)
+    assert small == large, (small_url, small, large_url, large)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/orders/today',
+    '/api/customers/1',
+    '/api/reports/dashboard',
+])
+def test_order_lists_constant_by_order_count(app, client, auth_headers, statements, url):
+    db.session.add_all([Customer(name=f'Customer {i}', phone=f'07000000{i}') for i in range(1, 4)])
+    _add_orders(2, customer_id=1)
+    few = _statement_count(client, url, auth_headers, statements)
+
+    _add_orders(30, customer_id=1)
+    many = _statement_count(client, url, auth_headers, statements)
+    assert few == many, (url, few, many)
+
+
+def test_batch_create_constant_by_order_count(app, client, auth_headers, statements):
+    order = {'payment_method': 'cash', 'payment_status': 'paid', 'items': [
+        {'item_type': 'service', 'item_name': 'Print', 'quantity': 1, 'unit_price': 10}
+    ]}
+
+    def other_statements(count):
+        del statements[:]
+        response = client.post('/api/orders/batch', headers=auth_headers, json={'orders': [order] * count})
+        assert response.status_code == 200 and response.get_json()['created'] == count
+        return len([s for s, _ in statements if not s.lstrip().upper().startswith('INSERT')])
+
+    other_statements(2)
+    few = other_statements(5)
+    many = other_statements(50)
+    assert few == many, (few, many)
@@ -0,0 +1,121 @@
+"""
+Report and listing queries must not scan the large tables (user-002)
+
+Seeds a few tens of thousands of orders, items and expenses, refreshes the
+planner statistics, runs every report and list endpoint while recording the
+SQL it issues, then EXPLAINs each statement and fails on any full scan of
+orders, order_items, expenses or customers, whether it walks the table or
+a whole index.
+"""
+
+import json
+import random
+import re
+from datetime import date, datetime, timedelta
+from app import db
+from app.models import Customer, Order, OrderItem, Expense
+
+ORDERS = 20000
+CUSTOMERS = 2000
+EXPENSES = 10000
+LARGE_TABLES = {'orders', 'order_items', 'expenses', 'customers'}
+
+
+def _seed():
+    rng = random.Random(7)
+    now = datetime.utcnow()
+
+    db.session.execute(db.insert(Customer), [
+        {'name': f'Customer {i}', 'phone': f'07{i:08d}', 'account_balance': i % 5,
+         'total_spent': i * 3, 'created_at': now - timedelta(days=i % 400),
+         'last_visit': now - timedelta(hours=i)}
+        for i in range(1, CUSTOMERS + 1)
+    ])
+    db.session.execute(db.insert(Order), [
+        {'order_number': f'ORD-T-{i:06d}', 'customer_id': rng.randint(1, CUSTOMERS), 'user_id': 1,
+         'total_amount': 100, 'discount': 0, 'final_amount': 100, 'payment_method': 'cash',
+         'payment_status': rng.choice(['paid', 'paid', 'pending']),
+         'status': rng.choice(['completed', 'pending', 'cancelled']),
+         'created_at': now - timedelta(minutes=30 * i)}
+        for i in range(1, ORDERS + 1)
+    ])
+    db.session.execute(db.insert(OrderItem), [
+        {'order_id': order_id, 'item_type': rng.choice(['service', 'product']), 'item_id': 1,
+         'item_name': 'A4 print', 'quantity': 2, 'unit_price': 25, 'total_price': 50}
+        for order_id in range(1, ORDERS + 1) for _ in range(2)
+    ])
+    db.session.execute(db.insert(Expense), [
+        {'category': rng.choice(['rent', 'supplies', 'utilities']), 'description': f'Expense {i}',
+         'amount': 10 + i % 90, 'payment_method': 'cash', 'user_id': 1,
+         'created_at': now - timedelta(hours=2 * i)}
+        for i in range(1, EXPENSES + 1)
+    ])
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+
+def _full_scans(statement, parameters):
+    """Names of large tables the plan reads with a full table scan"""
+    connection = db.session.connection()
+    if db.engine.dialect.name == 'postgresql':
+        plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        nodes, scans = [plan[0]['Plan']], set()
+        while nodes:
+            node = nodes.pop()
+            if node['Node Type'] == 'Seq Scan' and node['Relation Name'] in LARGE_TABLES:
+                scans.add(node['Relation Name'])
+            nodes.extend(node.get('Plans', []))
+        return scans
+
+    # "SEARCH orders ..." is a bounded range or key lookup. Any "SCAN orders"
+    # reads the whole table or a whole index, unless a LIMIT stops an
+    # index-ordered walk after the first rows
+    limited = re.search(r'\bLIMIT\b', statement, re.IGNORECASE) is not None
+    plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    scans = set()
+    for row in plan:
+        match = re.match(r'SCAN (\w+)(?: AS \w+)?( USING (?:COVERING )?INDEX| USING INTEGER PRIMARY KEY)?', row[-1])
+        if match and match.group(1) in LARGE_TABLES and not (limited and match.group(2)):
+            scans.add(match.group(1))
+    return scans
+
+
+def test_report_queries_use_indexes(app, client, auth_headers, statements):
+    _seed()
+
+    today = date.today()
+    month_ago = (today - timedelta(days=30)).isoformat()
+    urls = [
+        '/api/reports/dashboard',
+        f'/api/reports/sales?date_from={month_ago}&date_to={today.isoformat()}',
+        f'/api/reports/services?date_from={month_ago}&date_to={today.isoformat()}',
+        f'/api/reports/expenses?date_from={month_ago}&date_to={today.isoformat()}&group_by=week',
+        f'/api/reports/profit-loss?date_from={month_ago}&date_to={today.isoformat()}',
+        '/api/reports/customers',
+        '/api/orders/today',
+        '/api/orders/recent',
+        '/api/orders/?cursor=',
+        f'/api/orders/?cursor=&status=completed&date_from={month_ago}',
+        '/api/orders/?cursor=&customer_id=5',
+        '/api/customers/?cursor=',
+        '/api/customers/1',
+        '/api/expenses/?cursor='
+    ]
+
+    del statements[:]
+    for url in urls:
+        response = client.get(url, headers=auth_headers)
+        assert response.status_code == 200, (url, response.get_json())
+
+    selects = [(s, p) for s, p in statements if s.lstrip().upper().startswith(('SELECT', 'WITH'))]
+    assert len(selects) > len(urls)
+
+    failures = []
+    for statement, parameters in selects:
+        scans = _full_scans(statement, parameters)
+        if scans:
+            failures.append((sorted(scans), ' '.join(statement.split())[:300]))
+    assert not failures, '\n'.join(f'{tables}: {sql}' for tables, sql in failures)
@@ -0,0 +1,82 @@
+"""
+Customer search stays interactive at 500k customers (user-005)
+
+Seeds CUSTOMERS customers, refreshes the planner statistics, then replays
+lookup-box searches (phone prefixes, name fragments, a misspelt name, email
+fragments) through /api/customers/search and the ?search= filter on
+/api/customers/. The p95 latency must stay under 10 ms. This relies on the
+pg_trgm indexes, so it only runs on PostgreSQL.
+"""
+
+import random
+import time
+from app import db
+from app.models import Customer
+from conftest import requires_postgresql
+
+CUSTOMERS = 500000
+ROUNDS = 5
+P95_LIMIT_MS = 10
+
+FIRST_NAMES = ['Wanjiku', 'Kamau', 'Otieno', 'Achieng', 'Mwangi', 'Njeri', 'Kiprop', 'Chebet',
+               'Mutua', 'Akinyi', 'Omondi', 'Wambui', 'Kariuki', 'Nyambura', 'Ouma', 'Jeptoo']
+LAST_NAMES = ['Kimani', 'Odhiambo', 'Mugo', 'Wekesa', 'Barasa', 'Nduta', 'Korir', 'Maina',
+              'Onyango', 'Gitau', 'Rotich', 'Muthoni', 'Okoth', 'Kiplagat', 'Wairimu', 'Simiyu']
+TERMS = ['0712', '07123', '0734567', 'kam', 'otien', 'wanjiku', 'Achieng Mugo',
+         'wanjku', 'korir', 'mwangi.k', '@example']
+
+
+def _seed():
+    rng = random.Random(5)
+    batch = []
+    for i in range(CUSTOMERS):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        batch.append({
+            'name': f'{first} {last}',
+            'phone': f'07{i:08d}',
+            'email': f'{first}.{last}{i}@example.com'.lower() if i % 3 else None,
+            'account_balance': 0,
+            'total_spent': 0
+        })
+        if len(batch) == 10000:
+            db.session.execute(db.insert(Customer), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(Customer), batch)
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE customers'))
+    db.session.commit()
+
+
+def _p95(samples):
+    ordered = sorted(samples)
+    return ordered[int(len(ordered) * 0.95)]
+
+
+@requires_postgresql
+def test_customer_search_p95(app, client, auth_headers):
+    _seed()
+
+    urls = [f'/api/customers/search?q={term}' for term in TERMS]
+    urls += [f'/api/customers/?cursor=&per_page=10&search={term}' for term in TERMS]
+
+    # Warm the connection pool, plan caches and shared buffers
+    for url in urls:
+        assert client.get(url, headers=auth_headers).status_code == 200
+
+    timings = {url: [] for url in urls}
+    for _ in range(ROUNDS):
+        for url in urls:
+            began = time.perf_counter()
+            response = client.get(url, headers=auth_headers)
+            timings[url].append((time.perf_counter() - began) * 1000)
+            assert response.status_code == 200
+
+    samples = [ms for url_samples in timings.values() for ms in url_samples]
+    p95 = _p95(samples)
+    print(f'\n{len(samples)} searches over {CUSTOMERS} customers: '
+          f'p50 {sorted(samples)[len(samples) // 2]:.2f} ms, p95 {p95:.2f} ms')
+    for url, url_samples in timings.items():
+        print(f'  {_p95(url_samples):7.2f} ms  {url}')
+
+    assert p95 < P95_LIMIT_MS
@@ -0,0 +1,62 @@
+"""
+Concurrent sales never oversell (user-008)
+
+Several cashiers (threads, each with its own session and connection) race
+to sell the last units of one product. Exactly the available stock must be
+sold, every other sale must be refused with 400, and the stored quantity
+must end at zero, never below.
+"""
+
+import threading
+import time
+from app import db
+from app.models import InventoryItem, OrderItem
+
+STOCK = 25
+CASHIERS = 8
+SALES_PER_CASHIER = 10
+
+
+def test_concurrent_sales_do_not_oversell(app, client, auth_headers):
+    paper = InventoryItem(name='A4 ream', category='stationery', sku='A4', quantity=STOCK,
+                          min_quantity=5, unit_price=400, selling_price=550)
+    db.session.add(paper)
+    db.session.commit()
+    paper_id = paper.id
+
+    order = {'payment_method': 'cash', 'items': [
+        {'item_type': 'product', 'item_id': paper_id, 'item_name': 'A4 ream', 'quantity': 1, 'unit_price': 550}
+    ]}
+    statuses = []
+    lock = threading.Lock()
+    start = threading.Barrier(CASHIERS)
+
+    def cashier():
+        cashier_client = app.test_client()
+        start.wait()
+        for _ in range(SALES_PER_CASHIER):
+            response = cashier_client.post('/api/orders/', headers=auth_headers, json=order)
+            with lock:
+                statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=cashier) for _ in range(CASHIERS)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    attempts = CASHIERS * SALES_PER_CASHIER
+    print(f'\n{attempts} concurrent sale attempts in {elapsed:.2f}s ({attempts / elapsed:.0f}/s)')
+
+    assert len(statuses) == attempts
+    assert statuses.count(201) == STOCK
+    assert statuses.count(400) == attempts - STOCK
+
+    db.session.expire_all()
+    assert db.session.get(InventoryItem, paper_id).quantity == 0
+    sold = db.session.query(db.func.sum(OrderItem.quantity)).filter(
+        OrderItem.item_type == 'product', OrderItem.item_id == paper_id
+    ).scalar()
+    assert sold == STOCK